@@ -0,0 +1,159 @@
+import copy
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from redis import Redis
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from apps.accounts.models import User
+
+redis_client = Redis.from_url(settings.CACHES["default"]["LOCATION"], decode_responses=True)
+
+USER_CACHE_TTL = settings.AUTH_USER_CACHE_TTL              # время жизни пользователя в Redis (секунды)
+LOCAL_CACHE_TTL = settings.AUTH_USER_LOCAL_CACHE_TTL       # время жизни в памяти процесса (секунды)
+LOCAL_CACHE_SIZE = 10000                                   # при переполнении локальный кэш очищается целиком
+GENERATION_TTL = 3600                                      # поколение должно жить дольше любого чтения из БД
+
+# В кэше хранятся только поля, нужные для обработки запроса; хэш пароля не кэшируется,
+# для проверки отзыва токена (CHECK_REVOKE_TOKEN) хранится только его md5, как в самом токене
+CACHED_FIELDS = ("id", "email", "is_active", "is_staff", "is_superuser", "is_verified")
+
+# Запись пользователя, только если его поколение не изменилось с момента перед чтением из БД:
+# иначе запрос, прочитавший строку до изменения, вернул бы в кэш устаревшие данные
+_store = redis_client.register_script("""
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[2] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+return 1
+""")
+
+_local_cache = {}  # user_id -> (время истечения по time.monotonic, пользователь)
+_local_lock = threading.Lock()
+
+
+def _cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def _generation_key(user_id):
+    return f"auth:user:{user_id}:generation"
+
+
+def _dump(user):
+    data = {name: getattr(user, name) for name in CACHED_FIELDS}
+    data["id"] = str(data["id"])
+    data["password_hash"] = get_md5_hash_password(user.password)
+    return json.dumps(data)
+
+
+def _load(value):
+    # Объект как из QuerySet.only(): остальные поля (в том числе password) загружаются из БД при обращении,
+    # а save() без update_fields обновляет только загруженные и изменённые поля
+    data = json.loads(value)
+    password_hash = data.pop("password_hash")
+    data["id"] = User._meta.pk.to_python(data["id"])
+    # from_db ожидает значения в порядке полей модели
+    field_names = [field.attname for field in User._meta.concrete_fields if field.attname in CACHED_FIELDS]
+    user = User.from_db(DEFAULT_DB_ALIAS, field_names, [data[name] for name in field_names])
+    user.cached_password_hash = password_hash
+    return user
+
+
+def get_generation(user_id):
+    '''
+    Поколение записи пользователя в кэше, читается перед запросом к БД и передаётся в cache_user
+    '''
+    return redis_client.get(_generation_key(user_id)) or "0"
+
+
+def get_cached_user(user_id):
+    '''
+    Пользователь из кэша процесса или Redis, None при промахе.
+    Возвращается копия, чтобы изменения в одном запросе не попадали в другие
+    '''
+    user_id = str(user_id)
+    entry = _local_cache.get(user_id)
+    if entry and entry[0] > time.monotonic():
+        return copy.copy(entry[1])
+
+    value = redis_client.get(_cache_key(user_id))
+    if value is None:
+        return None
+    user = _load(value)
+    _remember(user_id, user)
+    return user
+
+
+def cache_user(user, generation):
+    '''
+    Сохранение пользователя в Redis и в кэше процесса.
+    :param generation: значение get_generation до чтения пользователя из БД; если с тех пор пользователь
+        изменился (invalidate_user), запись не выполняется
+    '''
+    value = _dump(user)
+    if _store(keys=[_cache_key(user.pk), _generation_key(user.pk)], args=[value, generation, USER_CACHE_TTL]):
+        _remember(str(user.pk), _load(value))  # в процессе хранится тот же набор полей, что и в Redis
+
+
+def invalidate_users(user_ids):
+    '''
+    Удаление пользователей из кэша после изменения (пароль, is_active, права) с увеличением поколения.
+    Вызывается после фиксации транзакции; кэши других процессов устаревают не позже чем через LOCAL_CACHE_TTL
+    '''
+    user_ids = [str(user_id) for user_id in user_ids]
+    if not user_ids:
+        return
+    pipe = redis_client.pipeline(transaction=True)
+    for user_id in user_ids:
+        pipe.delete(_cache_key(user_id))
+        pipe.incr(_generation_key(user_id))
+        pipe.expire(_generation_key(user_id), GENERATION_TTL)
+    pipe.execute()
+    with _local_lock:
+        for user_id in user_ids:
+            _local_cache.pop(user_id, None)
+
+
+def invalidate_user(user_id):
+    invalidate_users([user_id])
+
+
+def _remember(user_id, user):
+    with _local_lock:
+        if len(_local_cache) >= LOCAL_CACHE_SIZE:
+            _local_cache.clear()
+        _local_cache[user_id] = (time.monotonic() + LOCAL_CACHE_TTL, copy.copy(user))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация, которая берёт пользователя из кэша вместо SELECT на каждый запрос.
+    Кэш сбрасывается сигналами модели User (apps/accounts/signals.py) и UserQuerySet.update после фиксации транзакции
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = get_cached_user(user_id) if user_id is not None else None
+        if user is None:
+            generation = get_generation(user_id) if user_id is not None else None
+            user = super().get_user(validated_token)  # запрос к БД и все проверки simplejwt
+            cache_user(user, generation)
+            return user
+
+        # Те же проверки, что и в JWTAuthentication.get_user
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != user.cached_password_hash:
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
@@ -0,0 +1,143 @@
+import contextvars
+import logging
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.http import JsonResponse
+from redis import Redis
+from redis.exceptions import RedisError
+
+from apps.common.metrics import PASSWORD_HASHING_REJECTED
+
+logger = logging.getLogger(__name__)
+
+# Ограничение применяется только в HTTP-запросах (HashingLimitMiddleware); задачи Celery и команды
+# управления (createsuperuser, changepassword) вычисляют хэш без ограничения и никогда не получают HashingBusy
+limit_enabled = contextvars.ContextVar("password_hashing_limited", default=False)
+
+# Семафор на сортированном множестве: участник - слот, вес - время его занятия в миллисекундах.
+# Слоты старше таймаута (процесс упал, не освободив слот) удаляются при следующем занятии.
+# Время берётся из Redis, чтобы не зависеть от расхождения часов серверов приложения
+ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local timeout = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - timeout)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now, ARGV[3])
+redis.call('PEXPIRE', KEYS[1], timeout)
+return 1
+"""
+
+SLOTS_KEY = "accounts:password-hashing:slots"
+
+redis_client = Redis.from_url(settings.CACHES["default"]["LOCATION"])
+_acquire = redis_client.register_script(ACQUIRE_SCRIPT)
+
+
+class HashingBusy(Exception):
+    """
+    Во всех процессах одновременно вычисляется PASSWORD_HASHING_CONCURRENCY хэшей: запрос сразу получает 503
+    """
+
+
+def acquire_slot():
+    '''
+    Занятие слота хэширования, общего для всех процессов приложения.
+    :return: идентификатор слота или None, если Redis недоступен (хэш вычисляется без ограничения)
+    :raises HashingBusy: если все слоты заняты
+    '''
+    slot = uuid.uuid4().hex
+    timeout_ms = int(settings.PASSWORD_HASHING_SLOT_TIMEOUT * 1000)
+    try:
+        acquired = _acquire(keys=[SLOTS_KEY], args=[timeout_ms, settings.PASSWORD_HASHING_CONCURRENCY, slot])
+    except RedisError as e:
+        logger.warning("Ограничение хэширования паролей не проверено, Redis недоступен: %s", e)
+        return None
+    if not acquired:
+        PASSWORD_HASHING_REJECTED.inc()
+        raise HashingBusy()
+    return slot
+
+
+def release_slot(slot):
+    '''
+    Освобождение слота хэширования
+    '''
+    if slot is None:
+        return
+    try:
+        redis_client.zrem(SLOTS_KEY, slot)
+    except RedisError as e:
+        # Слот освободится сам через PASSWORD_HASHING_SLOT_TIMEOUT
+        logger.warning("Слот хэширования паролей не освобождён, Redis недоступен: %s", e)
+
+
+class LimitedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 с числом итераций из настройки PASSWORD_HASH_ITERATIONS.
+    В HTTP-запросах число одновременных вычислений по всем процессам ограничено PASSWORD_HASHING_CONCURRENCY:
+    хэш вычисляется в потоке запроса, а сверх лимита запрос получает 503, а не ждёт в очереди воркера.
+    Алгоритм остаётся pbkdf2_sha256, поэтому существующие хэши проверяются как раньше,
+    а хэши с другим числом итераций пересчитываются при следующем успешном входе (must_update)
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
+
+    def encode(self, password, salt, iterations=None):
+        # Через encode проходят make_password, verify и harden_runtime
+        if not limit_enabled.get():
+            return super().encode(password, salt, iterations)
+        slot = acquire_slot()
+        try:
+            return super().encode(password, salt, iterations)
+        finally:
+            release_slot(slot)
+
+
+def busy_response():
+    return JsonResponse(
+        {"detail": "Сервис перегружен, повторите попытку позже"},
+        status=503, headers={"Retry-After": "1"}, json_dumps_params={"ensure_ascii": False},
+    )
+
+
+class HashingLimitMiddleware:
+    """
+    Включение ограничения хэширования паролей для запроса и ответ 503 с Retry-After на HashingBusy
+    в любом представлении: DRF, админке и остальных
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = limit_enabled.set(True)
+        try:
+            return self.get_response(request)
+        finally:
+            limit_enabled.reset(token)
+
+    async def __acall__(self, request):
+        token = limit_enabled.set(True)  # переносится в потоки sync_to_async вместе с контекстом
+        try:
+            return await self.get_response(request)
+        finally:
+            limit_enabled.reset(token)
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, HashingBusy):
+            return busy_response()
+        return None
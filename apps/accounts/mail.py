@@ -0,0 +1,147 @@
+import json
+import uuid
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from redis import Redis
+
+# Очередь исходящих писем: задачи кладут письма в список Redis, а flush_mail_queue отправляет их пачками
+# через одно SMTP-соединение, вместо подключения к серверу на каждое письмо.
+# Взятые на отправку письма лежат в mail:processing, пока не отправлены, не возвращены в очередь или не перенесены
+# в mail:dead, поэтому при падении воркера они не теряются, а возвращаются в очередь следующей отправкой
+# (письмо, отправленное прямо перед падением, может уйти повторно)
+redis_client = Redis.from_url(settings.CACHES["default"]["LOCATION"])
+
+QUEUE_KEY = "mail:outbox"
+PROCESSING_KEY = "mail:processing"  # письма текущей пачки
+FLUSH_KEY = "mail:flush-scheduled"  # отправка очереди уже запланирована
+FLUSH_LOCK_KEY = "mail:flush-lock"  # очередь отправляет только один процесс
+FLUSH_LOCK_TTL = 120                # блокировка продлевается после каждого письма (секунды)
+DEAD_LETTER_KEY = "mail:dead"       # письма, которые не удалось отправить, для разбора вручную
+DEAD_LETTER_SIZE = 1000             # в списке хранятся только последние письма
+
+# Перенос до ARGV[1] писем из начала очереди в список обрабатываемых одной атомарной операцией
+_claim = redis_client.register_script("""
+local items = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #items > 0 then
+    redis.call('LTRIM', KEYS[1], #items, -1)
+    redis.call('RPUSH', KEYS[2], unpack(items))
+end
+return items
+""")
+
+# Возврат писем, оставшихся в обработке после падения воркера, в начало очереди с сохранением порядка
+_recover = redis_client.register_script("""
+local items = redis.call('LRANGE', KEYS[2], 0, -1)
+for i = #items, 1, -1 do
+    redis.call('LPUSH', KEYS[1], items[i])
+end
+redis.call('DEL', KEYS[2])
+return #items
+""")
+
+# Снятие блокировки только её владельцем
+_unlock = redis_client.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+
+
+def _dump(subject, body, from_email, to, attempts=0, **extra):
+    data = {"subject": subject, "body": body, "from_email": from_email, "to": list(to), "attempts": attempts, **extra}
+    return json.dumps(data, ensure_ascii=False)
+
+
+def _dump_message(message, **extra):
+    return _dump(message.subject, message.body, message.from_email, message.to, message.attempts, **extra)
+
+
+def _load(item):
+    data = json.loads(item)
+    attempts = data.pop("attempts", 0)
+    message = EmailMessage(**data)
+    message.attempts = attempts  # количество неудачных попыток отправки
+    message.queue_item = item    # исходная запись в mail:processing
+    return message
+
+
+def enqueue(subject, body, recipient_list, from_email=None):
+    '''
+    Добавление письма в очередь, возвращает длину очереди
+    '''
+    return redis_client.rpush(QUEUE_KEY, _dump(subject, body, from_email or settings.DEFAULT_FROM_EMAIL, recipient_list))
+
+
+def acquire_flush_lock():
+    '''
+    Блокировка отправки очереди, возвращает токен владельца или None, если очередь уже отправляется
+    '''
+    token = uuid.uuid4().hex
+    return token if redis_client.set(FLUSH_LOCK_KEY, token, nx=True, ex=FLUSH_LOCK_TTL) else None
+
+
+def release_flush_lock(token):
+    _unlock(keys=[FLUSH_LOCK_KEY], args=[token])
+
+
+def recover_processing():
+    '''
+    Возврат в очередь писем, оставшихся в обработке после прерванной отправки, возвращает их количество.
+    Вызывается только владельцем блокировки отправки
+    '''
+    return _recover(keys=[QUEUE_KEY, PROCESSING_KEY])
+
+
+def claim_batch(size):
+    '''
+    Перенос до size писем из очереди в mail:processing, письма возвращаются в виде EmailMessage
+    '''
+    items = _claim(keys=[QUEUE_KEY, PROCESSING_KEY], args=[size])
+    return [_load(item) for item in items]
+
+
+def ack(message):
+    '''
+    Удаление отправленного письма из mail:processing с продлением блокировки отправки
+    '''
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.lrem(PROCESSING_KEY, 1, message.queue_item)
+    pipe.expire(FLUSH_LOCK_KEY, FLUSH_LOCK_TTL)
+    pipe.execute()
+
+
+def requeue(messages):
+    '''
+    Возврат неотправленных писем из mail:processing в начало очереди с сохранением порядка
+    '''
+    if messages:
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.lpush(QUEUE_KEY, *reversed([_dump_message(m) for m in messages]))
+        for message in messages:
+            pipe.lrem(PROCESSING_KEY, 1, message.queue_item)
+        pipe.execute()
+
+
+def dead_letter(message, error):
+    '''
+    Перенос письма, которое не будет отправлено, из mail:processing в mail:dead вместе с текстом ошибки
+    '''
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.lpush(DEAD_LETTER_KEY, _dump_message(message, error=str(error)))
+    pipe.ltrim(DEAD_LETTER_KEY, 0, DEAD_LETTER_SIZE - 1)
+    pipe.lrem(PROCESSING_KEY, 1, message.queue_item)
+    pipe.expire(FLUSH_LOCK_KEY, FLUSH_LOCK_TTL)
+    pipe.execute()
+
+
+def mark_flush_scheduled(ttl):
+    '''
+    Отметка о запланированной отправке очереди, True - если её ещё не было и задачу нужно поставить
+    '''
+    return bool(redis_client.set(FLUSH_KEY, 1, nx=True, ex=ttl))
+
+
+def clear_flush_scheduled():
+    redis_client.delete(FLUSH_KEY)
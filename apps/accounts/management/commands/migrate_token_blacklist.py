@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from apps.accounts.tokens import blacklist_key, blacklist_ttl, redis_client
+
+
+class Command(BaseCommand):
+    help = "Перенос ещё не истёкших токенов из таблиц token_blacklist в чёрный список Redis"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Количество токенов в одной пачке")
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        rows = (
+            BlacklistedToken.objects
+            .filter(token__expires_at__gt=timezone.now())
+            .order_by("id")
+            .values_list("id", "token__jti", "token__expires_at")
+        )
+
+        last_id, total = 0, 0
+        while True:
+            chunk = list(rows.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+
+            pipe = redis_client.pipeline(transaction=False)
+            for _, jti, expires_at in chunk:
+                pipe.set(blacklist_key(jti), 1, ex=blacklist_ttl(expires_at.timestamp()))
+            pipe.execute()
+
+            last_id = chunk[-1][0]
+            total += len(chunk)
+            self.stdout.write(f"Перенесено {total} токенов")
+
+        self.stdout.write(self.style.SUCCESS(f"Перенос завершён: {total} токенов в Redis"))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаление строк из таблиц token_blacklist небольшими пачками. "
+        "По умолчанию удаляются только истёкшие токены, с --all - все (после migrate_token_blacklist)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Удалить все токены, а не только истёкшие")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Количество строк в одной транзакции")
+        parser.add_argument("--pause", type=float, default=0.1, help="Пауза между пачками (секунды)")
+
+    def handle(self, *args, **options):
+        tokens = OutstandingToken.objects.order_by("id")
+        if not options["all"]:
+            tokens = tokens.filter(expires_at__lte=timezone.now())
+
+        total = 0
+        while True:
+            ids = list(tokens.values_list("id", flat=True)[:options["chunk_size"]])
+            if not ids:
+                break
+
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            deleted, _ = OutstandingToken.objects.filter(id__in=ids).delete()
+            total += deleted
+            self.stdout.write(f"Удалено {total} токенов")
+            time.sleep(options["pause"])
+
+        self.stdout.write(self.style.SUCCESS(f"Очистка завершена: удалено {total} токенов"))
@@ -1,15 +1,34 @@
 from django.contrib.auth.models import BaseUserManager
 from django.core.validators import validate_email
+from django.db import transaction
 
-from apps.common.managers import GetOrNoneManager
+from apps.common.managers import GetOrNoneManager, GetOrNoneQuerySet
 from django.core.exceptions import ValidationError
 
 
+class UserQuerySet(GetOrNoneQuerySet):
+    """
+    Запрос пользователей, который сбрасывает кэш JWT-аутентификации после update().
+    Массовое обновление не вызывает сигналов модели, поэтому затронутые пользователи выбираются заранее
+    """
+
+    def update(self, **kwargs):
+        from apps.accounts.authentication import invalidate_users  # authentication импортирует модель User
+
+        user_ids = list(self.values_list("pk", flat=True))
+        rows = super().update(**kwargs)
+        transaction.on_commit(lambda: invalidate_users(user_ids), using=self.db)
+        return rows
+
+
 class CustomUserManager(GetOrNoneManager, BaseUserManager):
     """
     Менеджер для создания пользователей
     """
 
+    def get_queryset(self):
+        return UserQuerySet(self.model, using=self._db)
+
     def create_user(self, email, password, **extra_fields):
         """
         Создает и возвращает пользователя с данными email и паролем.
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:42
+
+import apps.common.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_unverified_created_idx'),
+    ]
+
+    # Значение по умолчанию задаётся только в Python: схема БД и существующие id (uuid4) не меняются,
+    # поэтому операция применяется только к состоянию моделей, без пересоздания таблицы в SQLite
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='user',
+                    name='id',
+                    field=models.UUIDField(default=apps.common.utils.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+            ],
+        ),
+    ]
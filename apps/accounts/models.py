@@ -1,5 +1,6 @@
 from django.core.validators import validate_email
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.contrib.auth.hashers import check_password
 
@@ -21,6 +22,13 @@ class User(AbstractBaseUser, PermissionsMixin, BaseModel):
 
     objects = CustomUserManager()
 
+    class Meta:
+        indexes = [
+            # Частичный индекс для очистки неподтверждённых пользователей (apps/accounts/purge.py):
+            # содержит только строки с is_verified=False, которых немного, и упорядочен по времени создания
+            models.Index(fields=["created_at"], condition=Q(is_verified=False), name="user_unverified_created_idx"),
+        ]
+
     def __str__(self):
         return f"{self.email}"
 
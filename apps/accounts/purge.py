@@ -0,0 +1,51 @@
+import logging
+import time
+from typing import NamedTuple
+
+from apps.accounts.models import User
+from apps.common.metrics import UNVERIFIED_USERS_PURGED, UNVERIFIED_USERS_PURGE_BATCH
+
+logger = logging.getLogger(__name__)
+
+
+class PurgeResult(NamedTuple):
+    deleted: int
+    batches: int
+    finished: bool  # False - остановлено по time_budget, остаток удаляется следующим запуском с тем же cutoff
+
+
+def purge_unverified_users(cutoff, batch_size, time_budget=None, pause=0.0):
+    '''
+    Удаление пользователей без подтверждения почты, созданных раньше cutoff, пачками по первичному ключу.
+    Каждая пачка удаляется в отдельной транзакции, поэтому прерванная очистка продолжается повторным запуском:
+    удалённые строки уже не попадают в выборку.
+    :param cutoff: граница времени создания
+    :param batch_size: количество пользователей в одной пачке
+    :param time_budget: ограничение времени работы (секунды), None - до конца
+    :param pause: пауза между пачками (секунды), чтобы не занимать БД непрерывно
+    '''
+    started = time.monotonic()
+    # Выборка по частичному индексу user_unverified_created_idx
+    candidates = User.objects.filter(is_verified=False, created_at__lt=cutoff).order_by("created_at")
+    deleted = batches = 0
+
+    while True:
+        ids = list(candidates.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return PurgeResult(deleted, batches, True)
+
+        with UNVERIFIED_USERS_PURGE_BATCH.time():
+            # Каскад (токены, группы, права, записи админки) затрагивает только строки этой пачки
+            # is_verified=False повторяется на случай подтверждения почты между выборкой и удалением
+            _, per_model = User.objects.filter(id__in=ids, is_verified=False).delete()
+        removed = per_model.get(User._meta.label, 0)
+        deleted += removed
+        batches += 1
+        UNVERIFIED_USERS_PURGED.inc(removed)
+        logger.debug("Очистка неподтверждённых пользователей: пачка %s, удалено %s", batches, deleted)
+
+        if len(ids) < batch_size:
+            return PurgeResult(deleted, batches, True)
+        if time_budget is not None and time.monotonic() - started >= time_budget:
+            return PurgeResult(deleted, batches, False)
+        time.sleep(pause)
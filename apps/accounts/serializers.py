@@ -1,4 +1,6 @@
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer, TokenVerifySerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
 from django.core.exceptions import ValidationError
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password as django_validate_password
@@ -6,6 +8,7 @@ from django.contrib.auth.password_validation import validate_password as django_
 
 
 from apps.accounts.models import User
+from apps.accounts.tokens import RefreshToken, is_blacklisted
 
 
 class CreateUserSerializer(serializers.ModelSerializer):
@@ -51,6 +54,8 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     """
     Сериализатор для получения токена
     """
+    token_class = RefreshToken
+
     @classmethod
     def get_token(cls, user):
         """
@@ -82,6 +87,27 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         return data
 
 
+class MyTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Сериализатор для обновления токена с чёрным списком в Redis
+    """
+    token_class = RefreshToken
+
+
+class MyTokenVerifySerializer(TokenVerifySerializer):
+    """
+    Сериализатор для проверки токена с чёрным списком в Redis
+    """
+
+    def validate(self, attrs):
+        token = UntypedToken(attrs["token"])
+
+        if api_settings.BLACKLIST_AFTER_ROTATION and is_blacklisted(token.get(api_settings.JTI_CLAIM)):
+            raise serializers.ValidationError("Token is blacklisted")
+
+        return {}
+
+
 class ChangePasswordSerializer(serializers.Serializer):
     """
     Сериализатор для изменения пароля
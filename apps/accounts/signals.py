@@ -1,5 +1,7 @@
-from django.db.models.signals import post_save, pre_save
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
+from apps.accounts.authentication import invalidate_user, invalidate_users
 from apps.accounts.models import User
 from apps.accounts.tasks import send_verification_email, send_password_changes_email
 
@@ -14,9 +16,28 @@ def send_verification_signal(sender, instance, created, **kwargs):
 @receiver(pre_save, sender=User)
 def send_password_changes(sender, instance, **kwargs):
     """Запускает задачу отправки email с информацией о смене пароля"""
-    try:
-        old_user = sender.objects.get(id=instance.id)
-        if old_user.password != instance.password:
-            send_password_changes_email.delay(instance.id)
-    except User.DoesNotExist:
-        return {"status": "error", "message": "Пользователь не найден"}
+    if kwargs.get("update_fields") == {"password"} and instance._password is None:
+        return  # пересчёт хэша при входе (AbstractBaseUser.check_password), пароль не менялся
+    # Сравнение со значением, загруженным из БД (BaseModel.has_changed), без повторного запроса
+    if not instance._state.adding and instance.has_changed("password"):
+        send_password_changes_email.delay(instance.id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Сбрасывает кэш JWT-аутентификации после изменения пользователя (пароль, is_active, флаги прав) или удаления"""
+    # После фиксации транзакции: до неё запрос из другого процесса ещё прочитает и закэширует старую строку
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_user(user_id), using=kwargs.get("using"))
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_cached_user_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    """Сбрасывает кэш JWT-аутентификации после изменения групп и прав пользователя"""
+    if not action.startswith("post_"):
+        return
+    # Изменение со стороны группы или права: затронуты пользователи из pk_set
+    user_ids = [instance.pk] if not reverse else list(pk_set or ())
+    transaction.on_commit(lambda: invalidate_users(user_ids), using=kwargs.get("using"))
@@ -2,22 +2,115 @@ from apps.accounts.utils import generate_verification_token
 from celery import shared_task
 import jwt
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import get_connection, send_mail
 import logging
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 import smtplib
 import redis
+from redis.exceptions import RedisError
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 
+from apps.accounts import mail
+from apps.common.metrics import MAIL_DEAD_LETTERS
 from apps.accounts.models import User
+from apps.accounts.purge import purge_unverified_users
 
 # Инициализация логгера для отладки и диагностики
 logger = logging.getLogger(__name__)
 
 
+def _is_permanent(error):
+    # 5xx - постоянный отказ для этого письма (размер, спам-фильтр, получатель); ошибка авторизации
+    # относится к настройкам, а не к письму, поэтому повторяется, как и 4xx, разрывы соединения и OSError
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        # Отказ постоянный, только если все получатели отклонены с 5xx (450/451/452 - greylisting, ящик занят)
+        return bool(error.recipients) and all(code >= 500 for code, _ in error.recipients.values())
+    return (
+        isinstance(error, smtplib.SMTPResponseException)
+        and not isinstance(error, smtplib.SMTPAuthenticationError)
+        and error.smtp_code >= 500
+    )
+
+
+def _schedule_flush(countdown):
+    # Одна запланированная отправка на всю очередь: письма за countdown секунд уходят одной пачкой
+    try:
+        scheduled = mail.mark_flush_scheduled(countdown + 60)
+    except RedisError as e:
+        # Письмо уже в очереди: лишний запуск безопасен (отправляет один процесс), пропущенный - нет
+        logger.warning("Отметка об отправке очереди писем недоступна, отправка планируется без неё: %s", e)
+        scheduled = True
+    if scheduled:
+        flush_mail_queue.apply_async(countdown=countdown)
+
+
+def queue_mail(subject, message, recipient_list):
+    '''
+    Постановка письма в очередь отправки пачками (flush_mail_queue).
+    Если Redis недоступен, письмо отправляется сразу
+    '''
+    try:
+        mail.enqueue(subject, message, recipient_list)
+    except RedisError as e:
+        logger.warning("Очередь писем недоступна (%s), письмо отправляется напрямую", e)
+        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, recipient_list, fail_silently=False)
+        return
+    _schedule_flush(settings.EMAIL_BATCH_DELAY)
+
+
+@shared_task
+def flush_mail_queue():
+    """
+    celery-задача для отправки накопленных писем пачками по EMAIL_BATCH_SIZE через одно SMTP-соединение.
+    При временной ошибке неотправленные письма возвращаются в очередь, отправка повторяется через EMAIL_RETRY_DELAY.
+    Письмо с постоянной ошибкой (5xx) или исчерпавшее EMAIL_MAX_ATTEMPTS попыток переносится в mail:dead.
+    Письма, оставшиеся в обработке после падения предыдущей отправки, сначала возвращаются в очередь
+    :return: словарь с количеством отправленных и отклонённых писем
+    """
+    mail.clear_flush_scheduled()  # письма, добавленные во время отправки, запланируют следующий запуск
+    lock = mail.acquire_flush_lock()
+    if lock is None:
+        _schedule_flush(settings.EMAIL_RETRY_DELAY)  # очередь отправляет другой процесс, проверим позже
+        return {"status": "locked", "sent": 0, "dropped": 0}
+
+    sent = dropped = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        if recovered := mail.recover_processing():
+            logger.warning("В очередь возвращено %s писем прерванной отправки", recovered)
+
+        while batch := mail.claim_batch(settings.EMAIL_BATCH_SIZE):
+            for index, message in enumerate(batch):
+                try:
+                    connection.open()  # соединение открывается один раз на всю очередь
+                    connection.send_messages([message])
+                except (smtplib.SMTPException, OSError) as e:
+                    message.attempts += 1
+                    if _is_permanent(e) or message.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+                        reason = "rejected" if _is_permanent(e) else "retries_exhausted"
+                        mail.dead_letter(message, e)
+                        MAIL_DEAD_LETTERS.labels(reason).inc()
+                        dropped += 1
+                        logger.error("Письмо для %s не отправлено (%s, попыток: %s): %s", message.to, reason, message.attempts, e)
+                        continue
+
+                    mail.requeue(batch[index:])
+                    _schedule_flush(settings.EMAIL_RETRY_DELAY)
+                    logger.error("Ошибка SMTP при отправке очереди писем, повтор через %s с: %s", settings.EMAIL_RETRY_DELAY, e)
+                    return {"status": "retry", "sent": sent, "dropped": dropped}
+                mail.ack(message)
+                sent += 1
+    finally:
+        connection.close()
+        mail.release_flush_lock(lock)
+
+    logger.info("Очередь писем отправлена: %s писем, отклонено %s", sent, dropped)
+    return {"status": "success", "sent": sent, "dropped": dropped}
+
+
 @shared_task
 def send_verification_email(user_id):
     """
@@ -42,8 +135,8 @@ def send_verification_email(user_id):
             "С уважением,\nКоманда поддержки Crypto API"
         )
 
-        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email], fail_silently=False)
-        logger.info(f"Письмо с подтверждением отправлено пользователю id={user_id}")
+        queue_mail(subject, message, [user.email])
+        logger.info(f"Письмо с подтверждением поставлено в очередь для пользователя id={user_id}")
         return {"message": "Письмо с подтверждением отправлено", "status": 200}
 
     except User.DoesNotExist:
@@ -93,15 +186,13 @@ def send_confirmation_email(user_id):
     try:
         user = User.objects.get(id=user_id)
         logger.info(f"Пользователь найден: {user.email}")
-        send_mail(
+        queue_mail(
             "Ваш email успешно подтверждён!",
             f"Спасибо, {user.email}, за подтверждение email. Теперь ваш аккаунт активирован.\n\n"
             "С уважением,\nКоманда поддержки Crypto API",
-            settings.DEFAULT_FROM_EMAIL,
             [user.email],
-            fail_silently=False,
         )
-        logger.info(f"Письмо успешно отправлено пользователю {user.email}")
+        logger.info(f"Письмо поставлено в очередь для пользователя {user.email}")
     except Exception as e:
         logger.error(f"Ошибка при отправке письма: {str(e)}", exc_info=True)
 
@@ -129,8 +220,8 @@ def send_reset_password_email_task(user_id):
             f"Ссылка для сброса пароля: {verification_url}\n\n"
             "С уважением,\nКоманда поддержки Crypto API"
         )
-        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email], fail_silently=False)
-        logger.info(f"Письмо с ссылкой для сброса пароля отправлено пользователю id={user_id}")
+        queue_mail(subject, message, [user.email])
+        logger.info(f"Письмо с ссылкой для сброса пароля поставлено в очередь для пользователя id={user_id}")
         return {"message": "Письмо с ссылкой для сброса пароля отправлено", "status": 200}
     except User.DoesNotExist:
         logger.error(f"Пользователь с id={user_id} не найден")
@@ -157,15 +248,13 @@ def reset_password_task(user_id, new_password):
         user.set_password(new_password)
         user.save()
 
-        send_mail(
+        queue_mail(
             "Ваш пароль успешно изменён!",
             f"Спасибо, {user.email}, за сброс пароля. Теперь ваш пароль активирован.\n\n"
             "С уважением,\nКоманда поддержки Crypto API",
-            settings.DEFAULT_FROM_EMAIL,
             [user.email],
-            fail_silently=False,
         )
-        logger.info(f"Пароль пользователя id={user_id} успешно изменен, письмо с подтверждением отправлено")
+        logger.info(f"Пароль пользователя id={user_id} успешно изменен, письмо с подтверждением поставлено в очередь")
         return {"status": "success", "message": "Пароль успешно изменен"}
     except serializers.ValidationError as e:
         logger.error(f"Ошибка при валидации пароля: {str(e)}", exc_info=True)
@@ -204,18 +293,12 @@ def send_password_changes_email(user_id):
             f"С уважением,\nКоманда поддержки Crypto API"
         )
 
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email],
-            fail_silently=False,
-        )
+        queue_mail(subject, message, [user.email])
 
         redis_client.setex(redis_key, 600, "sent")  # Блокировка на 10 минут отправки письма
-        logger.info(f"Письмо успешно отправлено пользователю id={user_id}")
+        logger.info(f"Письмо поставлено в очередь для пользователя id={user_id}")
 
-        return {"status": "success", "message": "Письмо отправлено"}
+        return {"status": "success", "message": "Письмо поставлено в очередь"}
 
     except User.DoesNotExist:
         logger.error(f"Пользователь с id={user_id} не найден")
@@ -226,15 +309,26 @@ def send_password_changes_email(user_id):
         return {"status": "error", "message": "Произошла неожиданная ошибка"}
 
 
-@shared_task
-def delete_unverified_users():
+@shared_task(bind=True)
+def delete_unverified_users(self, cutoff=None):
     '''
-    Удаление пользователей без подтверждения почты в течении 48 часов
+    Удаление пользователей без подтверждения почты в течении 48 часов.
+    Пользователи удаляются пачками (apps/accounts/purge.py); если очистка не уложилась в отведённое время,
+    задача ставится заново с той же границей cutoff и продолжает с оставшихся строк
     '''
-    logger.info("Удаление пользователей без подтверждения почты")
-    time_threshold = timezone.now() - timedelta(hours=48)
-    unverified_users = User.objects.filter(is_verified=False, created_at__lt=time_threshold)
-    deleted_count = unverified_users.count()
-    unverified_users.delete()
-    logger.info(f"Удалено {deleted_count} пользователей без подтверждения почты")
-    return f'Удалено {deleted_count} пользователей без подтверждения почты'
+    cutoff = datetime.fromisoformat(cutoff) if cutoff else timezone.now() - timedelta(hours=48)
+    logger.info(f"Удаление пользователей без подтверждения почты, созданных раньше {cutoff.isoformat()}")
+
+    result = purge_unverified_users(
+        cutoff,
+        batch_size=settings.UNVERIFIED_USERS_PURGE_BATCH_SIZE,
+        time_budget=settings.UNVERIFIED_USERS_PURGE_TIME_BUDGET,
+        pause=settings.UNVERIFIED_USERS_PURGE_PAUSE,
+    )
+    if not result.finished:
+        self.apply_async(args=[cutoff.isoformat()], countdown=1)
+        logger.info(f"Удалено {result.deleted} пользователей за {result.batches} пачек, очистка продолжится в следующей задаче")
+        return f'Удалено {result.deleted} пользователей без подтверждения почты, очистка продолжается'
+
+    logger.info(f"Удалено {result.deleted} пользователей без подтверждения почты")
+    return f'Удалено {result.deleted} пользователей без подтверждения почты'
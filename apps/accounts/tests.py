@@ -1,3 +1,151 @@
-from django.test import TestCase
+import smtplib
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.accounts import authentication, tokens
+from apps.accounts.models import User
+from apps.accounts.tasks import _is_permanent
+
+
+class MailErrorClassificationTests(SimpleTestCase):
+    """
+    Постоянные ошибки SMTP переносят письмо в mail:dead, остальные - повторяются
+    """
+
+    def test_permanent_response(self):
+        self.assertTrue(_is_permanent(smtplib.SMTPDataError(552, b"Message size exceeds limit")))
+        self.assertTrue(_is_permanent(smtplib.SMTPSenderRefused(550, b"Sender rejected", "from@example.com")))
+
+    def test_temporary_response(self):
+        self.assertFalse(_is_permanent(smtplib.SMTPDataError(451, b"Try again later")))
+
+    def test_authentication_error_is_retried(self):
+        self.assertFalse(_is_permanent(smtplib.SMTPAuthenticationError(535, b"Authentication failed")))
+
+    def test_connection_errors_are_retried(self):
+        self.assertFalse(_is_permanent(smtplib.SMTPServerDisconnected("Connection unexpectedly closed")))
+        self.assertFalse(_is_permanent(ConnectionResetError()))
+
+    def test_all_recipients_refused_permanently(self):
+        error = smtplib.SMTPRecipientsRefused({
+            "a@example.com": (550, b"No such user"),
+            "b@example.com": (553, b"Mailbox name not allowed"),
+        })
+
+        self.assertTrue(_is_permanent(error))
+
+    def test_greylisted_recipient_is_retried(self):
+        error = smtplib.SMTPRecipientsRefused({
+            "a@example.com": (550, b"No such user"),
+            "b@example.com": (451, b"Greylisted, try again later"),
+        })
+
+        self.assertFalse(_is_permanent(error))
+        self.assertFalse(_is_permanent(smtplib.SMTPRecipientsRefused({})))
+
+
+@override_settings(RATELIMIT_ENABLE=False)
+class RefreshTokenRotationTests(TestCase):
+    """
+    Ротация refresh-токенов с чёрным списком в Redis
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(email="user@example.com", password="!", is_verified=True)
+        self.url = reverse("token_refresh")
+
+    def _refresh(self, token):
+        return self.client.post(self.url, {"refresh": str(token)}, content_type="application/json")
+
+    def _forget(self, token):
+        tokens.redis_client.delete(tokens.blacklist_key(tokens.RefreshToken(token, verify=False)["jti"]))
+
+    def test_rotation_blacklists_used_token(self):
+        refresh = tokens.RefreshToken.for_user(self.user)
+        self.addCleanup(self._forget, str(refresh))
+
+        response = self._refresh(refresh)
+
+        self.assertEqual(response.status_code, 200)
+        rotated = response.json()["refresh"]
+        self.addCleanup(self._forget, rotated)
+        self.assertNotEqual(rotated, str(refresh))
+        self.assertIn("access", response.json())
+        self.assertTrue(tokens.is_blacklisted(refresh["jti"]))
+
+    def test_reused_token_is_rejected(self):
+        refresh = tokens.RefreshToken.for_user(self.user)
+        self.addCleanup(self._forget, str(refresh))
+        rotated = self._refresh(refresh).json()["refresh"]
+        self.addCleanup(self._forget, rotated)
+
+        response = self._refresh(refresh)
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["code"], "token_not_valid")
+        self.assertEqual(self._refresh(rotated).status_code, 200)  # новый токен по-прежнему действителен
+
+    def test_expired_token_is_not_stored(self):
+        tokens.blacklist_jti("expired-jti", exp=0)
+
+        self.assertFalse(tokens.redis_client.exists(tokens.blacklist_key("expired-jti")))
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """
+    Кэш пользователей при JWT-аутентификации и его сброс после изменения пользователя
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(email="user@example.com", password="!")
+        self.token = AccessToken.for_user(self.user)
+        self.authentication = authentication.CachedJWTAuthentication()
+        self.addCleanup(authentication.invalidate_user, self.user.pk)
+        authentication.invalidate_user(self.user.pk)  # запись, оставшаяся от предыдущего запуска
+
+    def test_cached_user_skips_database(self):
+        self.authentication.get_user(self.token)
+
+        with self.assertNumQueries(0):
+            user = self.authentication.get_user(self.token)
+
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.email, self.user.email)
+        self.assertNotIn("password", user.__dict__)  # хэш пароля не хранится в кэше
+
+    def test_save_invalidates_cache(self):
+        self.authentication.get_user(self.token)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user(self.token)
+
+    def test_queryset_update_invalidates_cache(self):
+        self.authentication.get_user(self.token)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(is_staff=True)
+
+        self.assertTrue(self.authentication.get_user(self.token).is_staff)
+
+    def test_stale_read_is_not_cached(self):
+        generation = authentication.get_generation(self.user.pk)
+        stale = User.objects.get(pk=self.user.pk)
+        authentication.invalidate_user(self.user.pk)  # пользователь изменён после чтения из БД
+
+        authentication.cache_user(stale, generation)
+
+        self.assertIsNone(authentication.get_cached_user(self.user.pk))
+
+    def test_cached_copy_is_isolated(self):
+        self.authentication.get_user(self.token)
+        first = self.authentication.get_user(self.token)
+        first.email = "changed@example.com"
+
+        self.assertEqual(self.authentication.get_user(self.token).email, "user@example.com")
@@ -0,0 +1,69 @@
+import time
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from redis import Redis
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import BlacklistMixin, RefreshToken as BaseRefreshToken
+
+# Чёрный список refresh-токенов хранится в Redis по jti с TTL до истечения токена,
+# вместо строк в таблицах token_blacklist, которые растут без ограничений
+redis_client = Redis.from_url(settings.CACHES["default"]["LOCATION"], decode_responses=True)
+
+
+def blacklist_key(jti):
+    return f"auth:blacklist:{jti}"
+
+
+def blacklist_ttl(exp):
+    '''
+    Оставшееся время жизни токена (секунды), не меньше 1
+    '''
+    return max(int(exp - time.time()) + 1, 1)
+
+
+def blacklist_jti(jti, exp):
+    '''
+    Добавление токена в чёрный список до момента его истечения
+    '''
+    if exp > time.time():
+        redis_client.set(blacklist_key(jti), 1, ex=blacklist_ttl(exp))
+
+
+def is_blacklisted(jti):
+    '''
+    Проверка токена по чёрному списку одним запросом к Redis.
+    На время перехода (JWT_BLACKLIST_DB_FALLBACK) дополнительно проверяются старые таблицы token_blacklist
+    '''
+    if redis_client.exists(blacklist_key(jti)):
+        return True
+    if settings.JWT_BLACKLIST_DB_FALLBACK:
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+    return False
+
+
+class RefreshToken(BaseRefreshToken):
+    """
+    Refresh-токен с чёрным списком в Redis: выдача и ротация не пишут в таблицы OutstandingToken/BlacklistedToken
+    """
+
+    def verify(self, *args, **kwargs):
+        self.check_blacklist()
+        super(BlacklistMixin, self).verify(*args, **kwargs)
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        blacklist_jti(self.payload[api_settings.JTI_CLAIM], self.payload["exp"])
+
+    def outstand(self):
+        return None
+
+    @classmethod
+    def for_user(cls, user):
+        # Token.for_user в обход BlacklistMixin.for_user, который создаёт OutstandingToken
+        return super(BlacklistMixin, cls).for_user(user)
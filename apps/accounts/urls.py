@@ -1,6 +1,6 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView, TokenVerifyView
-from django_ratelimit.decorators import ratelimit
+from apps.common.ratelimit import rate_limit
 from . import views
 
 urlpatterns = [
@@ -11,7 +11,7 @@ urlpatterns = [
     path('reset-password/', views.RequestResetPasswordView.as_view(), name="reset-password"),
     path('reset-password-confirm/', views.ResetPasswordConfirmAPIView.as_view(), name="reset-password-confirm"),
 
-    path('token/', ratelimit(key='ip', method='POST', rate='100/24h')(views.MyTokenObtainPairView.as_view()), name='token_obtain_pair'),
-    path('token/refresh/', ratelimit(key='ip', method='POST', rate='100/24h')(TokenRefreshView.as_view()), name='token_refresh'),
-    path('token/verify/', ratelimit(key='ip', method='POST', rate='100/24h')(TokenVerifyView.as_view()), name='token_verify'),
+    path('token/', rate_limit(ip='100/24h', method='POST')(views.MyTokenObtainPairView.as_view()), name='token_obtain_pair'),
+    path('token/refresh/', rate_limit(ip='100/24h', method='POST')(TokenRefreshView.as_view()), name='token_refresh'),
+    path('token/verify/', rate_limit(ip='100/24h', method='POST')(TokenVerifyView.as_view()), name='token_verify'),
 ]
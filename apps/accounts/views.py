@@ -10,7 +10,7 @@ from rest_framework import serializers
 
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
-from django_ratelimit.decorators import ratelimit
+from apps.common.ratelimit import rate_limit
 from django.utils.decorators import method_decorator
 
 from apps.accounts.serializers import CreateUserSerializer, ChangePasswordSerializer, ResetPasswordConfirmSerializer, VerifyEmailSerializer
@@ -25,7 +25,7 @@ from apps.accounts.tasks import verify_email_task, send_reset_password_email_tas
 tag = 'Аутентификация'
 
 
-@method_decorator(ratelimit(key='ip', rate='100/24h', block=True), name='create')  # Ограничение количества запросов 100 раз в 24 часа
+@method_decorator(rate_limit(ip='100/24h'), name='create')  # Ограничение количества запросов 100 раз в 24 часа
 class RegisterAPIView(CreateModelMixin, GenericViewSet):
     queryset = User.objects.all()
     serializer_class = CreateUserSerializer
@@ -48,7 +48,7 @@ class MyTokenObtainPairView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
 
 
-@method_decorator(ratelimit(key='ip', rate='100/24h', block=True), name='patch')  # Ограничение количества запросов 100 раз в 24 часа
+@method_decorator(rate_limit(ip='100/24h'), name='patch')  # Ограничение количества запросов 100 раз в 24 часа
 class ChangePasswordAPIView(APIView):
     permission_classes = [IsAuthenticated]    # Только аутентифицированные пользователи могут изменять пароль
     serializer_class = ChangePasswordSerializer
@@ -76,7 +76,7 @@ class ChangePasswordAPIView(APIView):
         return Response({"message": "Пароль успешно изменен"}, status=200)
 
 
-@method_decorator(ratelimit(key='ip', rate='100/24h', block=True), name='get')  # Ограничение количества запросов 100 раз в 24 часа
+@method_decorator(rate_limit(ip='100/24h'), name='get')  # Ограничение количества запросов 100 раз в 24 часа
 class VerifyEmailView(APIView):
     @extend_schema(
         summary="Подтверждение email",
@@ -104,7 +104,7 @@ class VerifyEmailView(APIView):
         return Response({"message": "После подтверждения email вам придет письмо об активации аккаунта"}, status=202)
 
 
-@method_decorator(ratelimit(key='ip', rate='100/24h', block=True), name='post')  # Ограничение количества запросов 100 раз в 24 часа
+@method_decorator(rate_limit(ip='100/24h'), name='post')  # Ограничение количества запросов 100 раз в 24 часа
 class RequestResetPasswordView(APIView):
     """
     Эндпоинт для отправки запроса на сброс пароля.
@@ -128,7 +128,7 @@ class RequestResetPasswordView(APIView):
         return Response({"message": "Письмо для сброса пароля отправлено"}, status=200)
 
 
-@method_decorator(ratelimit(key='ip', rate='100/24h', block=True), name='post')  # Ограничение количества запросов 100 раз в 24 часа
+@method_decorator(rate_limit(ip='100/24h'), name='post')  # Ограничение количества запросов 100 раз в 24 часа
 class ResetPasswordConfirmAPIView(APIView):
     """
     Эндпоинт для подтверждения сброса пароля и установки нового.
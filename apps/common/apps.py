@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CommonConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.common'
+
+    def ready(self):
+        # Подключение обработчиков сигналов Celery для метрик длительности задач
+        from . import metrics  # noqa: F401
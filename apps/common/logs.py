@@ -0,0 +1,157 @@
+import atexit
+import contextvars
+import copy
+import hmac
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+DEBUG_HEADER = "X-Debug-Log"  # заголовок, включающий подробное логирование для одного запроса
+DEBUG_LOGGERS = ("apps",)     # логгеры (с дочерними), для которых заголовок включает уровень DEBUG
+
+# Включено ли подробное логирование для текущего запроса (переносится в потоки sync_to_async вместе с контекстом)
+debug_enabled = contextvars.ContextVar("debug_enabled", default=False)
+
+
+class RequestDebugLogger(logging.Logger):
+    """
+    Логгер, который пропускает DEBUG ниже настроенного уровня только в запросах с включённой отладкой.
+    Решение принимается в isEnabledFor до создания записи, поэтому при уровне INFO
+    вызовы logger.debug в остальных запросах ничего не стоят
+    """
+
+    def __init__(self, name, level=logging.NOTSET):
+        super().__init__(name, level)
+        self.request_debug = any(name == prefix or name.startswith(f"{prefix}.") for prefix in DEBUG_LOGGERS)
+
+    def isEnabledFor(self, level):
+        if super().isEnabledFor(level):  # результат кэшируется logging, обычный путь не замедляется
+            return True
+        return self.request_debug and level >= logging.DEBUG and debug_enabled.get() \
+            and not self.disabled and self.manager.disable < level
+
+
+# Модуль импортируется конфигурацией LOGGING (фильтр и обработчик) при django.setup(),
+# до загрузки приложений, поэтому логгеры модулей apps.* создаются уже этим классом
+logging.setLoggerClass(RequestDebugLogger)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Выборка частых записей горячего пути.
+    Для логгеров из rates в лог попадает только указанная доля записей уровня INFO,
+    записи DEBUG пропускаются только в запросах с включённой отладкой, WARNING и выше - всегда
+    """
+
+    def __init__(self, rates=None, name=""):
+        super().__init__(name)
+        self.rates = rates or {}  # имя логгера -> доля записей INFO (0.0 - 1.0)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or debug_enabled.get():
+            return True
+        if record.levelno < logging.INFO:
+            return False
+        rate = self.rates.get(record.name)
+        return rate is None or random.random() < rate
+
+
+_exception_formatter = logging.Formatter()  # traceback для обработчика без своего форматтера
+
+
+class BackgroundHandler(QueueHandler):
+    """
+    Обработчик, который только кладёт запись в очередь.
+    Форматирование и запись в поток выполняет фоновый QueueListener, поэтому поток запроса не ждёт вывода.
+    При переполнении очереди записи отбрасываются, а не блокируют запрос
+    """
+
+    def __init__(self, queue_size=10000, stream=None):
+        super().__init__(queue.Queue(queue_size))
+        self.queue_size = queue_size
+        self.target = logging.StreamHandler(stream)
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        atexit.register(self.stop)
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def _ensure_listener(self):
+        # После fork (gunicorn, celery) поток родительского процесса в дочернем не работает
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self.queue = queue.Queue(self.queue_size)
+            self._listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+            self._listener.start()
+
+    def prepare(self, record):
+        # Сообщение и traceback подставляются в потоке запроса, пока аргументы не изменились;
+        # применение форматтера и вывод остаются фоновому потоку
+        message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = (self.target.formatter or _exception_formatter).formatException(record.exc_info)
+        record = copy.copy(record)  # как в QueueHandler.prepare: другие обработчики получают исходную запись
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record):
+        self._ensure_listener()
+        super().emit(record)
+
+    def stop(self):
+        '''
+        Остановка фонового потока с выводом оставшихся записей
+        '''
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+
+def _debug_requested(request):
+    value = request.headers.get(DEBUG_HEADER)
+    if not value:
+        return False
+    # Без токена подробное логирование по заголовку доступно только в режиме разработки
+    if settings.LOG_DEBUG_TOKEN:
+        return hmac.compare_digest(value, settings.LOG_DEBUG_TOKEN)
+    return settings.DEBUG
+
+
+@sync_and_async_middleware
+def debug_log_middleware(get_response):
+    '''
+    Включение подробного логирования (уровень DEBUG, без выборки) для запроса с заголовком X-Debug-Log
+    '''
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = debug_enabled.set(_debug_requested(request))
+            try:
+                return await get_response(request)
+            finally:
+                debug_enabled.reset(token)
+    else:
+        def middleware(request):
+            token = debug_enabled.set(_debug_requested(request))
+            try:
+                return get_response(request)
+            finally:
+                debug_enabled.reset(token)
+    return middleware
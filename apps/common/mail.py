@@ -0,0 +1,88 @@
+import atexit
+import logging
+import os
+import smtplib
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail.backends.smtp import EmailBackend
+
+logger = logging.getLogger(__name__)
+
+# Одно SMTP-соединение на процесс (celery prefork, gunicorn worker), общее для всех экземпляров бэкенда:
+# send_mail создаёт новый бэкенд на каждое письмо, поэтому соединение хранится на уровне модуля
+_lock = threading.RLock()
+_shared = {"pid": None, "connection": None, "used_at": 0.0}
+
+
+def _drop_shared():
+    connection = _shared["connection"]
+    owned = _shared["pid"] == os.getpid()
+    _shared.update(pid=None, connection=None, used_at=0.0)
+    # Сокет, унаследованный от родительского процесса после fork, не закрывается: им пользуется родитель
+    if connection is not None and owned:
+        try:
+            connection.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+
+
+def close_shared_connection():
+    '''
+    Закрытие общего SMTP-соединения процесса (при завершении процесса и перед переподключением)
+    '''
+    with _lock:
+        _drop_shared()
+
+
+atexit.register(close_shared_connection)
+
+
+class PooledSMTPEmailBackend(EmailBackend):
+    """
+    SMTP-бэкенд, который держит соединение (с уже выполненными STARTTLS и авторизацией) открытым между письмами.
+    Соединение, простаивавшее дольше EMAIL_CONNECTION_MAX_IDLE, открывается заново,
+    при разрыве со стороны сервера письмо отправляется повторно через новое соединение
+    """
+
+    def open(self):
+        shared = _shared["connection"]
+        if shared is not None and _shared["pid"] == os.getpid():
+            if time.monotonic() - _shared["used_at"] < settings.EMAIL_CONNECTION_MAX_IDLE:
+                self.connection = shared
+                return False
+            logger.debug("SMTP-соединение простаивало дольше %s с, переподключение", settings.EMAIL_CONNECTION_MAX_IDLE)
+        _drop_shared()
+
+        self.connection = None
+        opened = super().open()
+        if self.connection is not None:
+            _shared.update(pid=os.getpid(), connection=self.connection, used_at=time.monotonic())
+        return opened
+
+    def close(self):
+        # Соединение остаётся открытым для следующих писем, закрывается в close_shared_connection
+        self.connection = None
+
+    def send_messages(self, email_messages):
+        if not email_messages:
+            return 0
+        with _lock:
+            if self.open() is None:
+                return 0  # не удалось подключиться при fail_silently=True
+            sent = 0
+            for message in email_messages:
+                if self._send_with_reconnect(message):
+                    sent += 1
+            _shared["used_at"] = time.monotonic()
+            return sent
+
+    def _send_with_reconnect(self, message):
+        try:
+            return self._send(message)
+        except smtplib.SMTPServerDisconnected:
+            logger.warning("SMTP-сервер закрыл соединение, повторная отправка через новое соединение")
+            _drop_shared()
+            self.open()
+            return self._send(message)
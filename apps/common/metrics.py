@@ -0,0 +1,118 @@
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction
+from celery.signals import task_prerun, task_postrun
+from django.utils.decorators import sync_and_async_middleware
+from prometheus_client import Counter, Histogram
+
+# Для сбора метрик со всех процессов (gunicorn, uvicorn workers, celery prefork) процессы запускаются
+# с переменной окружения PROMETHEUS_MULTIPROC_DIR: значения пишутся в файлы и суммируются при выдаче /metrics
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса", ["method", "route", "status"],
+)
+
+CACHE_LOOKUPS = Counter("crypto_cache_lookups_total", "Обращения к кэшу курсов криптовалют", ["result"])
+CACHE_HITS = CACHE_LOOKUPS.labels("hit")
+CACHE_STALE = CACHE_LOOKUPS.labels("stale")
+CACHE_MISSES = CACHE_LOOKUPS.labels("miss")
+
+COINGECKO_LATENCY = Histogram(
+    "coingecko_request_duration_seconds", "Время запроса к CoinGecko API", ["path", "outcome"],
+)
+
+RABBITMQ_PUBLISH_LATENCY = Histogram(
+    "rabbitmq_publish_duration_seconds", "Время отправки задач в RabbitMQ", ["outcome"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+PASSWORD_HASHING_REJECTED = Counter(
+    "password_hashing_rejected_total", "Запросы, отклонённые с 503 из-за лимита одновременного хэширования паролей",
+)
+
+RATELIMIT_REJECTED = Counter("ratelimit_rejected_total", "Запросы, отклонённые с 429 по лимиту", ["group"])
+
+MAIL_DEAD_LETTERS = Counter(
+    "mail_dead_letters_total", "Письма, перенесённые в mail:dead без отправки", ["reason"],
+)
+
+UNVERIFIED_USERS_PURGED = Counter(
+    "accounts_unverified_users_purged_total", "Удалённые пользователи без подтверждения почты",
+)
+UNVERIFIED_USERS_PURGE_BATCH = Histogram(
+    "accounts_unverified_users_purge_batch_seconds", "Время удаления одной пачки неподтверждённых пользователей",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+CELERY_TASK_DURATION = Histogram(
+    "celery_task_duration_seconds", "Время выполнения задачи Celery", ["task", "state"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+
+
+def record_cache_lookups(found, requested):
+    '''
+    Учёт попаданий (свежих и устаревших) и промахов кэша курсов
+    '''
+    stale = sum(1 for entry in found if entry.is_stale)
+    if len(found) > stale:
+        CACHE_HITS.inc(len(found) - stale)
+    if stale:
+        CACHE_STALE.inc(stale)
+    if requested > len(found):
+        CACHE_MISSES.inc(requested - len(found))
+
+
+@contextmanager
+def timed(histogram, **labels):
+    '''
+    Замер длительности блока с меткой outcome: ok или error при исключении
+    '''
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        histogram.labels(outcome=outcome, **labels).observe(time.perf_counter() - started)
+
+
+def _observe_request(request, response, started):
+    match = getattr(request, "resolver_match", None)
+    route = match.route if match else "unmatched"  # шаблон маршрута, а не путь, чтобы не плодить метки
+    REQUEST_LATENCY.labels(request.method, route, response.status_code).observe(time.perf_counter() - started)
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    '''
+    Гистограмма времени ответа по методу, маршруту и статусу
+    '''
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            started = time.perf_counter()
+            response = await get_response(request)
+            _observe_request(request, response, started)
+            return response
+    else:
+        def middleware(request):
+            started = time.perf_counter()
+            response = get_response(request)
+            _observe_request(request, response, started)
+            return response
+    return middleware
+
+
+@task_prerun.connect
+def _task_prerun(task=None, **kwargs):
+    # Время начала хранится в контексте запроса задачи, а не в словаре модуля: для отозванной
+    # или прерванной задачи task_postrun не вызывается, и запись в словаре осталась бы навсегда
+    task.request.metrics_started = time.perf_counter()
+
+
+@task_postrun.connect
+def _task_postrun(task=None, state=None, **kwargs):
+    started = getattr(task.request, "metrics_started", None)
+    if started is not None:
+        CELERY_TASK_DURATION.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - started)
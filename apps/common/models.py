@@ -1,7 +1,8 @@
-import uuid
+import copy
 from django.db import models
 
 from apps.common.managers import GetOrNoneManager
+from apps.common.utils import uuid7
 
 
 
@@ -9,17 +10,91 @@ class BaseModel(models.Model):
     """
     Базовый класс, который включает в себя общие поля и методы для всех моделей.
 
+    Значения полей запоминаются при загрузке из БД (from_db) и после сохранения,
+    поэтому save() без update_fields обновляет только изменённые колонки, а has_changed() не обращается к БД.
+
+    Изменённые поля определяются непосредственно перед UPDATE, уже после переопределённых save() и
+    обработчиков pre_save, поэтому их изменения сохраняются. Не обнаруживаются изменения «на месте»
+    изменяемых значений, кроме dict и list (они копируются в снимок), и присваивания в __dict__ в обход
+    атрибутов: для таких случаев нужно передать update_fields или вызвать save(only_changed=False).
+
     Attributes:
-        id (UUIDField): Уникальный идентификатор записи.
+        id (UUIDField): Уникальный идентификатор записи, упорядоченный по времени создания (UUIDv7).
         created_at (DateTimeField): Дата и время создания записи.
         updated_at (DateTimeField): Дата и время обновления записи.
     """
-    id = models.UUIDField(default=uuid.uuid4, primary_key=True, editable=False)
+    id = models.UUIDField(default=uuid7, primary_key=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     objects = GetOrNoneManager()
 
+    _only_changed = False  # выставляется save() на время сохранения, см. _save_table
+
     class Meta:
         abstract = True
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_values(field_names)
+        return instance
+
+    def _remember_values(self, attnames):
+        # Снимок заменяется новым словарём: копии объекта (copy.copy из кэша) не должны делить его изменения
+        snapshot = dict(getattr(self, "_loaded_values", {}))
+        for attname in attnames:
+            if attname in self.__dict__:  # отложенные поля (defer/only) не загружены
+                value = self.__dict__[attname]
+                snapshot[attname] = copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+        self._loaded_values = snapshot
+
+    def has_changed(self, field_name):
+        '''
+        Изменилось ли поле с момента загрузки из БД или последнего сохранения.
+        Для несохранённых объектов всегда True
+        '''
+        field = self._meta.get_field(field_name)
+        snapshot = getattr(self, "_loaded_values", None)
+        if self._state.adding or snapshot is None:
+            return True
+        if field.attname not in snapshot:
+            return field.attname in self.__dict__  # отложенное поле считается изменённым, только если его присвоили
+        return self.__dict__.get(field.attname) != snapshot[field.attname]
+
+    @property
+    def changed_fields(self):
+        '''
+        Имена изменённых полей (см. has_changed)
+        '''
+        return [field.name for field in self._meta.concrete_fields if self.has_changed(field.name)]
+
+    def save(self, *args, update_fields=None, only_changed=True, **kwargs):
+        self._only_changed = only_changed and update_fields is None and not args \
+            and not kwargs.get("force_insert") and not self._state.adding and hasattr(self, "_loaded_values")
+        try:
+            super().save(*args, update_fields=update_fields, **kwargs)
+        finally:
+            del self._only_changed
+
+        saved = self._meta.concrete_fields if update_fields is None else [self._meta.get_field(name) for name in update_fields]
+        self._remember_values([field.attname for field in saved])
+
+    def _save_table(self, raw=False, cls=None, force_insert=False, force_update=False, using=None, update_fields=None):
+        # Вызывается из save_base после сигнала pre_save: набор изменённых полей учитывает изменения обработчиков
+        if update_fields is None and self._only_changed:
+            update_fields = self.changed_fields
+            if not update_fields:
+                return True  # изменений нет, запрос не выполняется; True - запись существует (post_save created=False)
+            # auto_now-поля (updated_at) обновляются, только если указаны в update_fields
+            update_fields += [f.name for f in self._meta.concrete_fields if getattr(f, "auto_now", False)]
+        return super()._save_table(raw, cls, force_insert, force_update, using, update_fields)
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        # Запоминаются только перечитанные поля: несохранённые изменения остальных должны попасть в save()
+        if fields is None:
+            refreshed = self._meta.concrete_fields
+        else:
+            refreshed = [self._meta.get_field(name) for name in fields]
+        self._remember_values([field.attname for field in refreshed if field.concrete])
@@ -0,0 +1,254 @@
+import asyncio
+import functools
+import ipaddress
+import logging
+import math
+import re
+import weakref
+from typing import NamedTuple
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+from redis.exceptions import RedisError
+
+from apps.common.metrics import RATELIMIT_REJECTED
+
+logger = logging.getLogger(__name__)
+
+# GCRA (алгоритм «виртуального расписания», эквивалент token bucket) для нескольких ключей за один вызов:
+# для каждого ключа хранится одно число - теоретическое время следующего запроса (TAT) в миллисекундах.
+# Все лимиты проверяются атомарно, и запрос учитывается только если его пропускают все ключи.
+# Время берётся из Redis (TIME), чтобы не зависеть от расхождения часов серверов приложения
+GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local allowed = 1
+local tats = {}
+local binding, remaining, reset, retry_after = 1, nil, 0, 0
+
+for i, key in ipairs(KEYS) do
+    local interval = tonumber(ARGV[i * 2 - 1])
+    local limit = tonumber(ARGV[i * 2])
+    local stored = redis.call('GET', key)
+    local tat = math.max(stored and tonumber(stored) or now, now)
+    local new_tat = tat + interval
+    local allow_at = new_tat - limit * interval
+    local left
+    if allow_at > now then
+        allowed = 0
+        left = 0
+        if allow_at - now > retry_after then
+            retry_after = allow_at - now
+            binding, reset = i, tat - now
+        end
+    else
+        left = math.floor((now - allow_at) / interval)
+    end
+    tats[i] = new_tat
+    if retry_after == 0 and (remaining == nil or left < remaining) then
+        binding, remaining, reset = i, left, new_tat - now
+    end
+end
+
+if allowed == 1 then
+    for i, key in ipairs(KEYS) do
+        redis.call('SET', key, tats[i], 'PX', tats[i] - now)
+    end
+else
+    remaining = 0
+end
+return {allowed, binding, remaining, reset, retry_after}
+"""
+
+redis_client = Redis.from_url(settings.CACHES["cache-for-ratelimiting"]["LOCATION"])
+_gcra = redis_client.register_script(GCRA_SCRIPT)  # EVALSHA, при отсутствии скрипта в Redis - EVAL
+
+_async_scripts = weakref.WeakKeyDictionary()  # клиент привязан к event loop, в котором создан
+
+
+def _get_async_script():
+    # Асинхронный клиент и скрипт для текущего event loop (как apps.crypto.services.redis.get_async_client)
+    loop = asyncio.get_running_loop()
+    script = _async_scripts.get(loop)
+    if script is None:
+        client = AsyncRedis.from_url(settings.CACHES["cache-for-ratelimiting"]["LOCATION"])
+        script = _async_scripts[loop] = client.register_script(GCRA_SCRIPT)
+    return script
+
+
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+RATE_RE = re.compile(r"^(\d+)/(\d*)([smhd])$")
+
+
+class Rate(NamedTuple):
+    limit: int     # запросов
+    period: int    # за период (секунды)
+
+    @property
+    def interval_ms(self):
+        return max(self.period * 1000 // self.limit, 1)
+
+    @property
+    def policy(self):
+        return f"{self.limit};w={self.period}"
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    rate: Rate            # лимит, ближе всего к исчерпанию (для заголовков)
+    remaining: int
+    reset: float          # секунд до полного восстановления лимита
+    retry_after: float    # секунд до следующего разрешённого запроса (0, если запрос пропущен)
+
+
+@functools.lru_cache
+def parse_rate(rate):
+    '''
+    Разбор лимита в формате django-ratelimit: "100/24h", "60/m", "5/10s"
+    '''
+    match = RATE_RE.match(rate)
+    if not match:
+        raise ValueError(f"Некорректный лимит: {rate}")
+    count, multiplier, unit = match.groups()
+    return Rate(int(count), int(multiplier or 1) * UNITS[unit])
+
+
+def client_ip(request):
+    # IPv6-клиенты обычно владеют целой подсетью /64, поэтому лимит считается на подсеть
+    address = request.META.get("REMOTE_ADDR", "")
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return address
+    if ip.version == 6:
+        return str(ipaddress.ip_network(f"{ip}/64", strict=False).network_address)
+    return address
+
+
+def _key_value(request, key):
+    if key == "ip":
+        return client_ip(request)
+    if key == "user":
+        user = getattr(request, "user", None)
+        # Для анонимных запросов лимит пользователя применяется к IP-адресу
+        if user is not None and user.is_authenticated:
+            return f"u{user.pk}"
+        return f"ip{client_ip(request)}"
+    return ""  # route - общий лимит маршрута для всех клиентов
+
+
+def _limit_args(request, group, limits):
+    keys, args = [], []
+    for key, rate in limits:
+        keys.append(f"rl:{group}:{key}:{_key_value(request, key)}")
+        args += [rate.interval_ms, rate.limit]
+    return keys, args
+
+
+def _decision(limits, result):
+    allowed, binding, remaining, reset, retry_after = (int(value) for value in result)
+    return Decision(bool(allowed), limits[binding - 1][1], remaining, reset / 1000, retry_after / 1000)
+
+
+def _group(request, group):
+    match = getattr(request, "resolver_match", None)
+    return group or (match.route if match else request.path)
+
+
+def check(request, limits, group=None):
+    '''
+    Проверка и учёт запроса по всем лимитам одним вызовом Lua-скрипта.
+    :param limits: список пар (ключ, Rate), ключ - ip, user или route
+    :return: Decision или None, если Redis недоступен (запрос пропускается)
+    '''
+    keys, args = _limit_args(request, _group(request, group), limits)
+    try:
+        return _decision(limits, _gcra(keys=keys, args=args))
+    except RedisError as e:
+        logger.warning("Ограничение запросов не проверено, Redis недоступен: %s", e)
+        return None
+
+
+async def acheck(request, limits, group=None):
+    '''
+    Асинхронный вариант check
+    '''
+    keys, args = _limit_args(request, _group(request, group), limits)
+    try:
+        return _decision(limits, await _get_async_script()(keys=keys, args=args))
+    except RedisError as e:
+        logger.warning("Ограничение запросов не проверено, Redis недоступен: %s", e)
+        return None
+
+
+def rate_limit_headers(decision, limits):
+    '''
+    Заголовки RateLimit-* (draft-ietf-httpapi-ratelimit-headers) и Retry-After при отказе
+    '''
+    headers = {
+        "RateLimit-Limit": str(decision.rate.limit),
+        "RateLimit-Remaining": str(decision.remaining),
+        "RateLimit-Reset": str(math.ceil(decision.reset)),
+        "RateLimit-Policy": ", ".join(rate.policy for _, rate in limits),
+    }
+    if not decision.allowed:
+        headers["Retry-After"] = str(max(math.ceil(decision.retry_after), 1))
+    return headers
+
+
+def _reject(request, group, decision, limits):
+    RATELIMIT_REJECTED.labels(_group(request, group)).inc()
+    return JsonResponse(
+        {"detail": "Слишком много запросов, повторите попытку позже"},
+        status=429, headers=rate_limit_headers(decision, limits), json_dumps_params={"ensure_ascii": False},
+    )
+
+
+def _apply_headers(response, decision, limits):
+    for name, value in rate_limit_headers(decision, limits).items():
+        response[name] = value
+    return response
+
+
+def rate_limit(ip=None, user=None, route=None, method=None, group=None):
+    '''
+    Декоратор представления (или метода через method_decorator) с лимитами на IP, пользователя и маршрут.
+    Лимиты задаются в формате "100/24h"; route - общий лимит маршрута для всех клиентов.
+    Запрос сверх лимита получает 429 с Retry-After, остальные ответы - заголовки RateLimit-*.
+    :param method: метод или список методов, к которым применяется лимит (по умолчанию все)
+    :param group: имя группы ключей, по умолчанию шаблон маршрута
+    '''
+    limits = [(key, parse_rate(rate)) for key, rate in (("ip", ip), ("user", user), ("route", route)) if rate]
+    methods = {method} if isinstance(method, str) else set(method or ())
+
+    def skip(request):
+        return not settings.RATELIMIT_ENABLE or (methods and request.method not in methods)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                if skip(request):
+                    return await view(request, *args, **kwargs)
+                decision = await acheck(request, limits, group)
+                if decision is None:
+                    return await view(request, *args, **kwargs)
+                if not decision.allowed:
+                    return _reject(request, group, decision, limits)
+                return _apply_headers(await view(request, *args, **kwargs), decision, limits)
+        else:
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                if skip(request):
+                    return view(request, *args, **kwargs)
+                decision = check(request, limits, group)
+                if decision is None:
+                    return view(request, *args, **kwargs)
+                if not decision.allowed:
+                    return _reject(request, group, decision, limits)
+                return _apply_headers(view(request, *args, **kwargs), decision, limits)
+        return wrapper
+    return decorator
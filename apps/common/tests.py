@@ -1,3 +1,182 @@
-from django.test import TestCase
+import time
+import uuid
 
-# Create your tests here.
+from django.db import connection
+from django.db.models.signals import pre_save
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.accounts.models import User
+from apps.common import ratelimit
+from apps.common.utils import uuid7
+
+
+class GCRARateLimitTests(SimpleTestCase):
+    """
+    Лимиты GCRA в Redis. Интервалы лимитов - минуты и часы, поэтому время выполнения теста на результат не влияет,
+    а течение времени моделируется сдвигом сохранённого TAT назад
+    """
+
+    def setUp(self):
+        self.group = f"test-{uuid.uuid4().hex}"
+        self.request = RequestFactory().get("/", REMOTE_ADDR="192.0.2.1")
+        self.addCleanup(self._clear_keys)
+
+    def _clear_keys(self):
+        keys = list(ratelimit.redis_client.scan_iter(f"rl:{self.group}:*"))
+        if keys:
+            ratelimit.redis_client.delete(*keys)
+
+    def _check(self, **rates):
+        limits = [(key, ratelimit.parse_rate(rate)) for key, rate in rates.items()]
+        return ratelimit.check(self.request, limits, group=self.group)
+
+    def _advance(self, key, ms):
+        # Сдвиг TAT ключа назад эквивалентен прошедшим ms миллисекундам
+        name = f"rl:{self.group}:{key}:{ratelimit._key_value(self.request, key)}"
+        ratelimit.redis_client.set(name, int(ratelimit.redis_client.get(name)) - ms, keepttl=True)
+
+    def test_parse_rate(self):
+        self.assertEqual(ratelimit.parse_rate("100/24h"), ratelimit.Rate(100, 86400))
+        self.assertEqual(ratelimit.parse_rate("5/10s"), ratelimit.Rate(5, 10))
+        self.assertEqual(ratelimit.parse_rate("60/m").interval_ms, 1000)
+        with self.assertRaises(ValueError):
+            ratelimit.parse_rate("10/week")
+
+    def test_burst_then_reject(self):
+        remaining = [self._check(ip="3/h").remaining for _ in range(3)]
+        rejected = self._check(ip="3/h")
+
+        self.assertEqual(remaining, [2, 1, 0])
+        self.assertFalse(rejected.allowed)
+        self.assertEqual(rejected.remaining, 0)
+        self.assertAlmostEqual(rejected.retry_after, 1200, delta=1)  # интервал 3/h - 20 минут
+
+    def test_interval_restores_one_request(self):
+        for _ in range(3):
+            self._check(ip="3/h")
+        self.assertFalse(self._check(ip="3/h").allowed)
+
+        self._advance("ip", 1_200_000)
+
+        self.assertTrue(self._check(ip="3/h").allowed)
+        self.assertFalse(self._check(ip="3/h").allowed)
+
+    def test_rejected_request_consumes_no_limit(self):
+        self.assertTrue(self._check(ip="5/h", route="1/h").allowed)
+
+        rejected = self._check(ip="5/h", route="1/h")
+
+        self.assertFalse(rejected.allowed)
+        self.assertEqual(rejected.rate, ratelimit.Rate(1, 3600))  # отказ по лимиту маршрута
+        # Отклонённый запрос не учтён в лимите IP: остаётся 5 - 1 - 1 после следующего запроса
+        self.assertEqual(self._check(ip="5/h").remaining, 3)
+
+    def test_headers(self):
+        limits = [("ip", ratelimit.parse_rate("1/h"))]
+        self._check(ip="1/h")
+
+        headers = ratelimit.rate_limit_headers(self._check(ip="1/h"), limits)
+
+        self.assertEqual(headers["RateLimit-Limit"], "1")
+        self.assertEqual(headers["RateLimit-Remaining"], "0")
+        self.assertEqual(headers["RateLimit-Policy"], "1;w=3600")
+        self.assertIn(headers["Retry-After"], {"3599", "3600"})
+
+    def test_ipv6_limited_per_subnet(self):
+        first = RequestFactory().get("/", REMOTE_ADDR="2001:db8::1")
+        second = RequestFactory().get("/", REMOTE_ADDR="2001:db8::ffff")
+
+        self.assertEqual(ratelimit.client_ip(first), ratelimit.client_ip(second))
+
+
+class ChangedFieldsSaveTests(TestCase):
+    """
+    save() без update_fields обновляет только изменённые поля
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(email="user@example.com", password="!")
+        self.user = User.objects.get(pk=self.user.pk)
+
+    def _update_sql(self, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            self.user.save(**kwargs)
+        return [query["sql"] for query in queries.captured_queries if query["sql"].startswith("UPDATE")]
+
+    def test_unchanged_instance_skips_query(self):
+        with self.assertNumQueries(0):
+            self.user.save()
+
+    def test_updates_changed_and_auto_now_fields(self):
+        self.user.is_verified = True
+
+        [sql] = self._update_sql()
+
+        self.assertIn('"is_verified"', sql)
+        self.assertIn('"updated_at"', sql)
+        self.assertNotIn('"email"', sql)
+        self.assertNotIn('"password"', sql)
+        self.assertEqual(self.user.changed_fields, [])
+        self.assertTrue(User.objects.get(pk=self.user.pk).is_verified)
+
+    def test_pre_save_changes_are_saved(self):
+        def verify(sender, instance, **kwargs):
+            instance.is_verified = True
+
+        pre_save.connect(verify, sender=User)
+        self.addCleanup(pre_save.disconnect, verify, sender=User)
+        self.user.is_staff = True
+
+        self.user.save()
+
+        stored = User.objects.get(pk=self.user.pk)
+        self.assertTrue(stored.is_staff)
+        self.assertTrue(stored.is_verified)
+
+    def test_only_changed_disabled(self):
+        self.user.is_verified = True
+
+        [sql] = self._update_sql(only_changed=False)
+
+        self.assertIn('"email"', sql)
+        self.assertIn('"password"', sql)
+
+    def test_changes_in_other_instance_kept(self):
+        other = User.objects.get(pk=self.user.pk)
+        other.is_staff = True
+        other.save()
+        self.user.is_verified = True
+
+        self.user.save()
+
+        stored = User.objects.get(pk=self.user.pk)
+        self.assertTrue(stored.is_staff)
+        self.assertTrue(stored.is_verified)
+
+
+class UUID7Tests(SimpleTestCase):
+    """
+    Идентификаторы UUIDv7 (RFC 9562)
+    """
+
+    def test_version_and_variant(self):
+        value = uuid7()
+
+        self.assertEqual(value.version, 7)
+        self.assertEqual(value.variant, uuid.RFC_4122)
+
+    def test_values_increase(self):
+        values = [uuid7() for _ in range(10000)]  # много значений в одной миллисекунде
+
+        self.assertEqual(values, sorted(values))
+        self.assertEqual(len(set(values)), len(values))
+
+    def test_timestamp_prefix(self):
+        before = time.time_ns() // 1_000_000
+        value = uuid7()
+        after = time.time_ns() // 1_000_000
+
+        self.assertLessEqual(before, value.int >> 80)
+        # При переполнении счётчика внутри миллисекунды время в идентификаторе может опережать часы
+        self.assertLess(value.int >> 80, after + 1000)
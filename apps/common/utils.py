@@ -1,3 +1,9 @@
+import secrets
+import threading
+import time
+import uuid
+
+
 def set_dict_attr(obj, data):
     """
     Устанавливает атрибуты на данном объекте на основе предоставленного словаря.
@@ -12,3 +18,34 @@ def set_dict_attr(obj, data):
     for attr, value in data.items():
         setattr(obj, attr, value)
     return obj
+
+
+_uuid7_lock = threading.Lock()
+_uuid7_state = {"ms": 0, "counter": 0}
+
+
+def uuid7():
+    """
+    Генерирует UUID версии 7 (RFC 9562), упорядоченный по времени создания.
+
+    Первые 48 бит - время в миллисекундах, поэтому новые значения первичного ключа попадают в конец индекса,
+    а не в случайное место B-дерева, как uuid4. Следующие 12 бит - счётчик внутри миллисекунды
+    (значения из одного процесса строго возрастают), остальные 62 бита - случайные.
+
+    Returns:
+        uuid.UUID: Новый идентификатор.
+    """
+    with _uuid7_lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _uuid7_state["ms"]:
+            counter = secrets.randbits(11)  # случайное начало с запасом для увеличения в той же миллисекунде
+        else:
+            ms = _uuid7_state["ms"]  # часы не идут назад относительно уже выданных значений
+            counter = _uuid7_state["counter"] + 1
+            if counter > 0xFFF:
+                ms += 1
+                counter = secrets.randbits(11)
+        _uuid7_state.update(ms=ms, counter=counter)
+
+    value = (ms & 0xFFFF_FFFF_FFFF) << 80 | 0x7 << 76 | counter << 64 | 0b10 << 62 | secrets.randbits(62)
+    return uuid.UUID(int=value)
@@ -1,3 +1,68 @@
-from django.shortcuts import render
+import hmac
+import os
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.views import View
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+
+class AsyncAPIView(View):
+    """
+    Базовое асинхронное представление для ASGI.
+    Выполняет аутентификацию и проверку прав DRF, а обработчики отвечают через JsonResponse
+    """
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
+
+    def check_access(self, request):
+        """
+        Аутентификация пользователя и проверка прав доступа, как в APIView.initial
+        """
+        request.user  # аутентификация выполняется лениво при первом обращении
+        for permission in [permission() for permission in self.permission_classes]:
+            if not permission.has_permission(request, self):
+                if request.successful_authenticator is None:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied(getattr(permission, "message", None))
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(request, authenticators=[auth() for auth in self.authentication_classes])
+        try:
+            await sync_to_async(self.check_access)(request)  # аутентификатор может обращаться к БД
+        except exceptions.APIException as e:
+            # Формат ответа как у rest_framework.views.exception_handler
+            data = e.detail if isinstance(e.detail, (list, dict)) else {"detail": e.detail}
+            return self.json(data, status=e.status_code)
+
+        return await super().dispatch(request, *args, **kwargs)
+
+    @staticmethod
+    def json(data, status=200, headers=None):
+        return JsonResponse(data, status=status, headers=headers, json_dumps_params={"ensure_ascii": False})
+
+
+def metrics_view(request):
+    '''
+    Метрики в текстовом формате Prometheus.
+    В многопроцессном режиме (PROMETHEUS_MULTIPROC_DIR) значения суммируются по файлам всех процессов.
+    Доступ по токену METRICS_TOKEN, без токена - только в режиме разработки
+    '''
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}"
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), expected):
+            return HttpResponse(status=403)
+    elif not settings.DEBUG:
+        return HttpResponse(status=403)
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
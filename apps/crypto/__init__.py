@@ -1 +0,0 @@
-from .services.tasks import fetch_supported_symbols
@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from apps.crypto.models import PriceCandle
+
+
+@admin.register(PriceCandle)
+class PriceCandleAdmin(admin.ModelAdmin):
+    list_display = ('symbol', 'interval', 'bucket', 'open', 'high', 'low', 'close')
+    list_filter = ('interval',)
+    search_fields = ('symbol',)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CryptoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.crypto'
+
+    def ready(self):
+        # Задачи лежат в services.tasks, а не в tasks.py, поэтому регистрируем их явно после загрузки моделей
+        from .services import tasks  # noqa: F401
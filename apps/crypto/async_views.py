@@ -0,0 +1,234 @@
+import asyncio
+import json
+import logging
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.permissions import AllowAny, IsAuthenticated
+
+from apps.common.views import AsyncAPIView
+from apps.crypto.services import redis, rabbitmq, debug_utils, symbols, stream, refresh
+from apps.crypto.views import MAX_BATCH_SYMBOLS, parse_symbols, parse_wait, cache_headers, cached_response, conditional_response, price_rate_limit
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = 15  # интервал отправки комментария-пинга в SSE-потоке (секунды)
+RECONNECT_DELAY_MS = 3000  # через сколько клиент переподключается после обрыва
+
+
+@price_rate_limit
+class AsyncCryptoPriceView(AsyncAPIView):
+    """
+    Асинхронный вариант CryptoPriceAPIView для ASGI
+    """
+    # При тестировании и разработки доступно всем, при необходимости можно ограничить доступ только аутентифицированным
+    permission_classes = [AllowAny] if settings.DEBUG else [IsAuthenticated]
+
+    async def get(self, request, symbol):
+        symbol = symbol.upper()
+
+        wait = parse_wait(request.GET.get("wait"))
+        if wait is None:
+            return self.json({"detail": "Параметр wait должен быть числом"}, status=400)
+
+        SUPPORTED_SYMBOLS = await symbols.aget_symbol_map()
+
+        if not SUPPORTED_SYMBOLS:
+            return self.json({"detail": "Символы временно недоступны"}, status=503)
+
+        if symbol not in SUPPORTED_SYMBOLS:
+            return self.json({"detail": f"Символ не поддерживается: {symbol}"}, status=400)
+
+        await redis.arecord_requests([symbol])
+
+        cached = await redis.aget_cached_price(symbol)
+
+        if cached and not cached.is_stale:
+            return cached_response(request, cached)
+
+        leased = await redis.aacquire_refresh_leases([symbol])
+
+        # Устаревший курс отдаём сразу, а обновление запускаем в фоне (stale-while-revalidate)
+        if cached:
+            if leased:
+                try:
+                    await rabbitmq.apublish_crypto_tasks(leased)
+                except rabbitmq.PublishError:
+                    await redis.arelease_refresh_leases(leased)
+            headers = cache_headers(cached)
+            return conditional_response(request, cached, headers) or self.json(
+                {"symbol": symbol, "price": cached.price, "source": "stale-cache", "age": round(cached.age, 1)},
+                headers=headers,
+            )
+
+        # Обновление запускает только первый запрос, остальные не отправляют задачу и не ходят в API
+        if leased:
+            # Для тестирования при разработке
+            if settings.API_ALLOW_FALLBACK:
+                fetched = await debug_utils.afetch_direct_prices([symbol], SUPPORTED_SYMBOLS)
+                if symbol in fetched:
+                    await refresh.astore_prices(fetched)
+                    return self.json({"symbol": symbol, "price": fetched[symbol], "source": "coingecko (dev fallback)"})
+
+            try:
+                await rabbitmq.apublish_crypto_tasks(leased)
+            except rabbitmq.PublishError:
+                await redis.arelease_refresh_leases(leased)  # Даём следующему запросу повторить попытку
+                return self.json({"detail": "Сервис временно недоступен"}, status=503)
+
+        # Режим long-poll: ждём без блокировки потока, пока обработчик очереди запишет курс
+        if wait:
+            cached = await redis.await_price(symbol, wait)
+            if cached:
+                return cached_response(request, cached)
+
+        return self.json({"status": "pending", "retry_after": 3}, status=202)
+
+
+@price_rate_limit
+class AsyncCryptoPricesView(AsyncAPIView):
+    """
+    Асинхронный вариант CryptoPricesAPIView для ASGI
+    """
+    # При тестировании и разработки доступно всем, при необходимости можно ограничить доступ только аутентифицированным
+    permission_classes = [AllowAny] if settings.DEBUG else [IsAuthenticated]
+
+    async def get(self, request):
+        requested = parse_symbols(request.GET.get("symbols", ""))
+
+        if not requested:
+            return self.json({"detail": "Не переданы символы"}, status=400)
+
+        if len(requested) > MAX_BATCH_SYMBOLS:
+            return self.json({"detail": f"Слишком много символов, максимум {MAX_BATCH_SYMBOLS}"}, status=400)
+
+        SUPPORTED_SYMBOLS = await symbols.aget_symbol_map()
+
+        if not SUPPORTED_SYMBOLS:
+            return self.json({"detail": "Символы временно недоступны"}, status=503)
+
+        unsupported = [symbol for symbol in requested if symbol not in SUPPORTED_SYMBOLS]
+        if unsupported:
+            return self.json({"detail": f"Символы не поддерживаются: {', '.join(unsupported)}"}, status=400)
+
+        await redis.arecord_requests(requested)
+
+        cached = await redis.aget_cached_prices(requested)
+        results = {}
+        for symbol, entry in cached.items():
+            if entry.is_stale:
+                results[symbol] = {"price": entry.price, "status": "stale", "age": round(entry.age, 1)}
+            else:
+                results[symbol] = {"price": entry.price, "status": "cached"}
+
+        missing = [symbol for symbol in requested if symbol not in cached]
+        stale = [symbol for symbol, entry in cached.items() if entry.is_stale]
+
+        # Обновляем только символы, для которых ещё никто не запустил обновление
+        to_refresh = await redis.aacquire_refresh_leases(missing + stale) if missing or stale else []
+
+        # Для тестирования при разработке, устаревшие курсы обновляются только в фоне
+        to_fetch = [symbol for symbol in to_refresh if symbol not in cached]
+        if to_fetch and settings.API_ALLOW_FALLBACK:
+            fetched = await debug_utils.afetch_direct_prices(to_fetch, SUPPORTED_SYMBOLS)
+            if fetched:
+                await refresh.astore_prices(fetched)
+                results.update({symbol: {"price": price, "status": "cached"} for symbol, price in fetched.items()})
+                missing = [symbol for symbol in missing if symbol not in fetched]
+                to_refresh = [symbol for symbol in to_refresh if symbol not in fetched]
+
+        data = {"results": {symbol: results.get(symbol, {"price": None, "status": "pending"}) for symbol in requested}}
+
+        if to_refresh:
+            try:
+                await rabbitmq.apublish_crypto_tasks(to_refresh)  # Одно сообщение на все промахи кэша
+            except rabbitmq.PublishError:
+                await redis.arelease_refresh_leases(to_refresh)
+                if missing:
+                    return self.json({"detail": "Сервис временно недоступен"}, status=503)
+
+        if missing:
+            data["retry_after"] = 3
+
+        return self.json(data)
+
+
+def format_event(symbol, entry):
+    '''
+    Событие SSE с обновлением курса, id события - время получения курса в миллисекундах
+    '''
+    data = json.dumps({"symbol": symbol, "price": entry.price, "fetched_at": entry.fetched_at})
+    return f"id: {int(entry.fetched_at * 1000)}\nevent: price\ndata: {data}\n\n"
+
+
+class AsyncCryptoStreamView(AsyncAPIView):
+    """
+    Поток обновлений курсов в формате Server-Sent Events (только ASGI).
+    При подключении устаревшие и отсутствующие в кэше курсы обновляются так же, как в AsyncCryptoPriceView.
+    Last-Event-ID не воспроизводит пропущенные события: после переподключения отправляется только текущий
+    курс из кэша, если он новее последнего полученного события, промежуточные изменения не повторяются
+    """
+    # При тестировании и разработки доступно всем, при необходимости можно ограничить доступ только аутентифицированным
+    permission_classes = [AllowAny] if settings.DEBUG else [IsAuthenticated]
+
+    async def get(self, request):
+        requested = parse_symbols(request.GET.get("symbols", ""))
+
+        if not requested:
+            return self.json({"detail": "Не переданы символы"}, status=400)
+
+        if len(requested) > MAX_BATCH_SYMBOLS:
+            return self.json({"detail": f"Слишком много символов, максимум {MAX_BATCH_SYMBOLS}"}, status=400)
+
+        SUPPORTED_SYMBOLS = await symbols.aget_symbol_map()
+
+        if not SUPPORTED_SYMBOLS:
+            return self.json({"detail": "Символы временно недоступны"}, status=503)
+
+        unsupported = [symbol for symbol in requested if symbol not in SUPPORTED_SYMBOLS]
+        if unsupported:
+            return self.json({"detail": f"Символы не поддерживаются: {', '.join(unsupported)}"}, status=400)
+
+        # Браузер при переподключении передаёт id последнего полученного события
+        try:
+            last_event_id = int(request.headers.get("Last-Event-ID") or request.GET.get("last_event_id") or 0)
+        except ValueError:
+            last_event_id = 0
+
+        response = StreamingHttpResponse(self.events(requested, last_event_id), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # отключаем буферизацию в nginx
+        return response
+
+    async def events(self, requested, last_event_id):
+        broadcaster = stream.get_broadcaster()
+        queue = broadcaster.subscribe(requested)
+        try:
+            yield f"retry: {RECONNECT_DELAY_MS}\n\n"
+
+            # Текущие курсы (или только новее последнего полученного события при переподключении)
+            cached = await redis.aget_cached_prices(requested)
+            for symbol, entry in cached.items():
+                if int(entry.fetched_at * 1000) > last_event_id:
+                    yield format_event(symbol, entry)
+
+            # Устаревшие и отсутствующие курсы обновляются в фоне, новые значения придут событиями
+            to_refresh = [symbol for symbol in requested if symbol not in cached or cached[symbol].is_stale]
+            leased = await redis.aacquire_refresh_leases(to_refresh) if to_refresh else []
+            if leased:
+                try:
+                    await rabbitmq.apublish_crypto_tasks(leased)
+                except rabbitmq.PublishError:
+                    await redis.arelease_refresh_leases(leased)  # Даём следующему запросу повторить попытку
+
+            # Символы из открытых потоков учитываются в популярности и обновляются заранее
+            await redis.arecord_requests(requested)
+            while True:
+                try:
+                    symbol, entry = await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    await redis.arecord_requests(requested)
+                    yield ": ping\n\n"
+                    continue
+                yield format_event(symbol, entry)
+        finally:
+            broadcaster.unsubscribe(queue, requested)
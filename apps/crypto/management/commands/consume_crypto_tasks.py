@@ -0,0 +1,92 @@
+import json
+import logging
+import time
+
+import pika
+from pika.exceptions import AMQPError
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.crypto.services.rabbitmq import CRYPTO_TASKS_QUEUE
+from apps.crypto.services.refresh import refresh_prices
+
+logger = logging.getLogger(__name__)
+
+
+def parse_symbols(body):
+    '''
+    Извлечение символов из сообщения {"symbol": ...} или {"symbols": [...]}
+    '''
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        logger.warning("Некорректное сообщение в очереди: %r", body)
+        return []
+
+    if not isinstance(payload, dict):
+        return []
+    symbols = payload.get("symbols") or [payload.get("symbol")]
+    return [str(symbol).upper() for symbol in symbols if symbol]
+
+
+class Command(BaseCommand):
+    help = "Обработка задач на обновление курсов из очереди crypto.tasks пакетами"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Максимальный размер пакета сообщений (prefetch)")
+        parser.add_argument("--max-wait", type=float, default=0.5, help="Максимальное ожидание набора пакета (секунды)")
+        parser.add_argument("--reconnect-delay", type=float, default=5.0, help="Пауза перед переподключением к RabbitMQ (секунды)")
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                self.consume(options["batch_size"], options["max_wait"])
+            except AMQPError as e:
+                # Разрыв соединения или закрытие канала брокером (переобъявление очереди, таймаут потребителя)
+                logger.error("Потеряно соединение или канал RabbitMQ: %r", e)
+                time.sleep(options["reconnect_delay"])
+            except KeyboardInterrupt:
+                logger.info("Обработчик очереди crypto.tasks остановлен")
+                return
+
+    def consume(self, batch_size, max_wait):
+        '''
+        Чтение очереди пакетами: пакет обрабатывается, когда набрано batch_size сообщений
+        или с момента получения первого сообщения прошло max_wait секунд
+        '''
+        connection = pika.BlockingConnection(pika.URLParameters(settings.RABBITMQ_URL))
+        channel = connection.channel()
+        channel.queue_declare(queue=CRYPTO_TASKS_QUEUE, durable=True)
+        channel.basic_qos(prefetch_count=batch_size)
+        logger.info("Ожидание задач из очереди %s", CRYPTO_TASKS_QUEUE)
+
+        batch = []
+        deadline = None
+        try:
+            for method, properties, body in channel.consume(CRYPTO_TASKS_QUEUE, inactivity_timeout=max_wait):
+                if method is not None:
+                    batch.append((method.delivery_tag, body))
+                    deadline = deadline or time.monotonic() + max_wait
+
+                if batch and (len(batch) >= batch_size or time.monotonic() >= deadline):
+                    self.process_batch(channel, batch)
+                    batch, deadline = [], None
+        finally:
+            if connection.is_open:
+                connection.close()
+
+    def process_batch(self, channel, batch):
+        '''
+        Обработка пакета: дедупликация символов, один запрос к CoinGecko и одна запись в кэш
+        '''
+        symbols = list(dict.fromkeys(symbol for _, body in batch for symbol in parse_symbols(body)))
+
+        if symbols:
+            try:
+                refresh_prices(symbols)
+            except Exception as e:
+                # Аренды сняты, следующий запрос клиента повторно поставит задачу в очередь
+                logger.error("Ошибка при обновлении курсов %s: %s", symbols, e, exc_info=True)
+
+        channel.basic_ack(delivery_tag=batch[-1][0], multiple=True)
+        logger.info("Обработан пакет: %s сообщений, %s символов", len(batch), len(symbols))
@@ -1,3 +1,49 @@
 from django.db import models
 
-# Create your models here.
+
+class PriceTick(models.Model):
+    """
+    Курс криптовалюты, полученный при обновлении кэша.
+    Хранится ограниченное время и используется только для построения свечей
+    """
+    symbol = models.CharField(max_length=32)
+    price = models.FloatField()
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["symbol", "fetched_at"], name="crypto_tick_symbol_time_idx"),
+            models.Index(fields=["fetched_at"], name="crypto_tick_time_idx"),  # для агрегации и очистки по времени
+        ]
+
+    def __str__(self):
+        return f"{self.symbol} {self.price} ({self.fetched_at})"
+
+
+class PriceCandle(models.Model):
+    """
+    Свеча OHLC за интервал 1 минута, 1 час или 1 день
+    """
+    class Interval(models.TextChoices):
+        MINUTE = "1m", "1 минута"
+        HOUR = "1h", "1 час"
+        DAY = "1d", "1 день"
+
+    symbol = models.CharField(max_length=32)
+    interval = models.CharField(max_length=2, choices=Interval.choices)
+    bucket = models.DateTimeField()  # начало интервала
+    open = models.FloatField()
+    high = models.FloatField()
+    low = models.FloatField()
+    close = models.FloatField()
+    ticks = models.PositiveIntegerField(default=0)  # количество курсов, вошедших в свечу
+
+    class Meta:
+        constraints = [
+            # Индекс ограничения используется для выборки свечей по символу, интервалу и периоду
+            models.UniqueConstraint(fields=["symbol", "interval", "bucket"], name="crypto_candle_unique_bucket"),
+        ]
+        ordering = ["bucket"]
+
+    def __str__(self):
+        return f"{self.symbol} {self.interval} {self.bucket}"
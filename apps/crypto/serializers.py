@@ -0,0 +1,26 @@
+from rest_framework import serializers
+
+from apps.crypto.models import PriceCandle
+
+
+class PriceCandleSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор свечи OHLC
+    """
+    class Meta:
+        model = PriceCandle
+        fields = ("bucket", "open", "high", "low", "close")
+
+
+class OHLCQuerySerializer(serializers.Serializer):
+    """
+    Сериализатор параметров запроса свечей
+    """
+    interval = serializers.ChoiceField(choices=PriceCandle.Interval.choices, default=PriceCandle.Interval.HOUR)
+    start = serializers.DateTimeField(required=False, help_text="Начало периода (ISO 8601)")
+    end = serializers.DateTimeField(required=False, help_text="Конец периода (ISO 8601)")
+
+    def validate(self, attrs):
+        if attrs.get("start") and attrs.get("end") and attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError("Начало периода должно быть раньше конца")
+        return attrs
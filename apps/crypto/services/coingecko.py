@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import weakref
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+
+from apps.common import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_IDS_PER_REQUEST = 250  # ограничение на длину строки запроса /simple/price
+
+# Повтор запросов при сетевых ошибках, 429 и 5xx с экспоненциальной задержкой (0.5, 1, 2 секунды)
+retry = Retry(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=("GET",),
+    respect_retry_after_header=False,
+)
+
+# Общая сессия с пулом соединений, чтобы не открывать TCP/TLS соединение на каждый запрос
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry))
+session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry))
+
+
+def get(path, params=None):
+    '''
+    GET-запрос к CoinGecko API, возвращает разобранный JSON
+    '''
+    with metrics.timed(metrics.COINGECKO_LATENCY, path=path):
+        response = session.get(
+            f"{settings.COINGECKO_API_URL}{path}",
+            headers={"x-cg-api-key": settings.COINGECKO_API_KEY},
+            params=params,
+            timeout=settings.COINGECKO_TIMEOUT,
+        )
+        response.raise_for_status()
+    return response.json()
+
+
+def fetch_prices(coingecko_ids, vs_currency="usd"):
+    '''
+    Получение курсов нескольких монет через /simple/price?ids=a,b,c
+    Возвращает словарь coingecko_id -> курс
+    '''
+    coingecko_ids = list(coingecko_ids)
+    prices = {}
+
+    for i in range(0, len(coingecko_ids), MAX_IDS_PER_REQUEST):
+        chunk = coingecko_ids[i:i + MAX_IDS_PER_REQUEST]
+        data = get("/simple/price", params={"ids": ",".join(chunk), "vs_currencies": vs_currency})
+        for coingecko_id in chunk:
+            price = data.get(coingecko_id, {}).get(vs_currency)
+            if price is not None:
+                prices[coingecko_id] = price
+
+    logger.info("Получено %s из %s курсов с CoinGecko", len(prices), len(coingecko_ids))
+    return prices
+
+
+_async_clients = weakref.WeakKeyDictionary()  # клиент привязан к event loop, в котором создан
+
+
+def get_async_client():
+    '''
+    Неблокирующий HTTP-клиент с пулом соединений для текущего event loop
+    '''
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = httpx.AsyncClient(
+            base_url=settings.COINGECKO_API_URL,
+            headers={"x-cg-api-key": settings.COINGECKO_API_KEY or ""},
+            timeout=settings.COINGECKO_TIMEOUT,
+            transport=httpx.AsyncHTTPTransport(retries=2),
+            limits=httpx.Limits(max_connections=16),
+        )
+    return client
+
+
+async def afetch_prices(coingecko_ids, vs_currency="usd"):
+    '''
+    Асинхронное получение курсов нескольких монет через /simple/price?ids=a,b,c
+    '''
+    coingecko_ids = list(coingecko_ids)
+    client = get_async_client()
+    prices = {}
+
+    for i in range(0, len(coingecko_ids), MAX_IDS_PER_REQUEST):
+        chunk = coingecko_ids[i:i + MAX_IDS_PER_REQUEST]
+        with metrics.timed(metrics.COINGECKO_LATENCY, path="/simple/price"):
+            response = await client.get("/simple/price", params={"ids": ",".join(chunk), "vs_currencies": vs_currency})
+            response.raise_for_status()
+        data = response.json()
+        for coingecko_id in chunk:
+            price = data.get(coingecko_id, {}).get(vs_currency)
+            if price is not None:
+                prices[coingecko_id] = price
+
+    logger.info("Получено %s из %s курсов с CoinGecko", len(prices), len(coingecko_ids))
+    return prices
@@ -1,7 +1,9 @@
+import httpx
 import requests
-from django.conf import settings
 import logging
 
+from apps.crypto.services import coingecko
+
 logger = logging.getLogger(__name__)
 
 
@@ -9,20 +11,43 @@ def fetch_direct_price(symbol, symbol_map):
     '''
     Получение курса криптовалюты напрямую с coingecko для тестирования
     '''
-    url = f"https://api.coingecko.com/api/v3/simple/price"
-    headers = {"x-cg-api-key": settings.COINGECKO_API_KEY}
     coingecko_id = symbol_map.get(symbol)
-    logger.info(f"coingecko_id: {coingecko_id}")
+    logger.info("coingecko_id: %s", coingecko_id)
 
-    params = {
-        "ids": coingecko_id,
-        "vs_currencies": "usd",
-        }
-    result = requests.get(url, headers=headers, params=params)
     try:
-        data = result.json()
-        price = data.get(coingecko_id, {}).get("usd")
-        return price
-    except ValueError as e:
-        logger.error(f"Ошибка при fallback-запросе: {e}", exc_info=True)
+        return coingecko.fetch_prices([coingecko_id]).get(coingecko_id)
+    except (requests.RequestException, ValueError) as e:
+        logger.error("Ошибка при fallback-запросе: %s", e, exc_info=True)
         return None
+
+
+def fetch_direct_prices(symbols, symbol_map):
+    '''
+    Получение курсов нескольких криптовалют напрямую с coingecko одним запросом для тестирования
+    '''
+    ids = {symbol_map[symbol]: symbol for symbol in symbols if symbol in symbol_map}
+    logger.info("coingecko_ids: %s", list(ids))
+
+    try:
+        fetched = coingecko.fetch_prices(ids)
+    except (requests.RequestException, ValueError) as e:
+        logger.error("Ошибка при fallback-запросе: %s", e, exc_info=True)
+        return {}
+
+    return {ids[coingecko_id]: price for coingecko_id, price in fetched.items()}
+
+
+async def afetch_direct_prices(symbols, symbol_map):
+    '''
+    Асинхронное получение курсов нескольких криптовалют напрямую с coingecko для тестирования
+    '''
+    ids = {symbol_map[symbol]: symbol for symbol in symbols if symbol in symbol_map}
+    logger.info("coingecko_ids: %s", list(ids))
+
+    try:
+        fetched = await coingecko.afetch_prices(ids)
+    except (httpx.HTTPError, ValueError) as e:
+        logger.error("Ошибка при fallback-запросе: %s", e, exc_info=True)
+        return {}
+
+    return {ids[coingecko_id]: price for coingecko_id, price in fetched.items()}
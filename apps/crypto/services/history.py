@@ -0,0 +1,158 @@
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from apps.crypto.models import PriceTick, PriceCandle
+from apps.crypto.services.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+Interval = PriceCandle.Interval
+
+INTERVALS = {
+    Interval.MINUTE: timedelta(minutes=1),
+    Interval.HOUR: timedelta(hours=1),
+    Interval.DAY: timedelta(days=1),
+}
+
+# Сколько хранить данные каждого уровня: сырые курсы -> минутные -> часовые -> дневные (бессрочно)
+TICK_RETENTION = timedelta(days=2)
+RETENTION = {
+    Interval.MINUTE: timedelta(days=7),
+    Interval.HOUR: timedelta(days=365),
+}
+
+# Срок хранения источника свечей каждого интервала: раньше него пересчитывать нечего
+SOURCE_RETENTION = {
+    Interval.MINUTE: TICK_RETENTION,
+    Interval.HOUR: RETENTION[Interval.MINUTE],
+    Interval.DAY: RETENTION[Interval.HOUR],
+}
+
+CANDLE_FIELDS = ["open", "high", "low", "close", "ticks"]
+
+ROLLUP_WATERMARK_KEY = "crypto:history:rollup:{interval}"  # начало периода, с которого продолжается пересчёт
+ROLLUP_BATCH_BUCKETS = 60  # периодов в одном запросе при пересчёте пропущенных после простоя
+
+
+def floor_time(moment, interval):
+    '''
+    Начало интервала, в который попадает момент времени
+    '''
+    if interval == Interval.DAY:
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == Interval.HOUR:
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(second=0, microsecond=0)
+
+
+def record_ticks(prices):
+    '''
+    Сохранение полученных курсов одним bulk_create
+    '''
+    fetched_at = timezone.now()
+    PriceTick.objects.bulk_create(
+        [PriceTick(symbol=symbol, price=price, fetched_at=fetched_at) for symbol, price in prices.items()]
+    )
+
+
+def _fold(rows, interval):
+    # rows упорядочены по символу и времени: (symbol, time, open, high, low, close, ticks)
+    candles = {}
+    for symbol, moment, open_, high, low, close, ticks in rows:
+        key = (symbol, floor_time(moment, interval))
+        candle = candles.get(key)
+        if candle is None:
+            candles[key] = PriceCandle(
+                symbol=symbol, interval=interval, bucket=key[1],
+                open=open_, high=high, low=low, close=close, ticks=ticks,
+            )
+        else:
+            candle.high = max(candle.high, high)
+            candle.low = min(candle.low, low)
+            candle.close = close
+            candle.ticks += ticks
+    return list(candles.values())
+
+
+def _get_watermark(interval):
+    try:
+        value = redis_client.get(ROLLUP_WATERMARK_KEY.format(interval=interval))
+    except RedisError as e:
+        logger.warning("Отметка пересчёта свечей %s недоступна: %s", interval, e)
+        return None
+    return datetime.fromtimestamp(int(value), tz=dt_timezone.utc) if value else None
+
+
+def _set_watermark(interval, moment):
+    try:
+        redis_client.set(ROLLUP_WATERMARK_KEY.format(interval=interval), int(moment.timestamp()))
+    except RedisError as e:
+        logger.warning("Отметка пересчёта свечей %s не сохранена: %s", interval, e)
+
+
+def _source_rows(interval, start, end):
+    if interval == Interval.MINUTE:
+        return (
+            (symbol, fetched_at, price, price, price, price, 1)
+            for symbol, fetched_at, price in PriceTick.objects
+            .filter(fetched_at__gte=start, fetched_at__lt=end)
+            .order_by("symbol", "fetched_at")
+            .values_list("symbol", "fetched_at", "price")
+            .iterator()
+        )
+    source = Interval.MINUTE if interval == Interval.HOUR else Interval.HOUR
+    return (
+        PriceCandle.objects
+        .filter(interval=source, bucket__gte=start, bucket__lt=end)
+        .order_by("symbol", "bucket")
+        .values_list("symbol", "bucket", *CANDLE_FIELDS)
+        .iterator()
+    )
+
+
+def rollup(interval, now=None):
+    '''
+    Пересчёт свечей интервала: минутные строятся из сырых курсов, часовые из минутных, дневные из часовых.
+    Пересчитываются периоды от отметки предыдущего запуска (период, который тогда был текущим) до текущего,
+    но не меньше предыдущего и текущего периода. Поэтому пропущенные запуски и поздно записанные курсы
+    не оставляют свечи неполными; после простоя периоды пересчитываются пачками по ROLLUP_BATCH_BUCKETS
+    '''
+    now = now or timezone.now()
+    current = floor_time(now, interval)
+    since = current - INTERVALS[interval]
+    watermark = _get_watermark(interval)
+    if watermark is not None:
+        # Данные источника старше срока хранения уже удалены
+        since = min(since, floor_time(max(watermark, now - SOURCE_RETENTION[interval]), interval))
+
+    updated = 0
+    step = INTERVALS[interval] * ROLLUP_BATCH_BUCKETS
+    start = since
+    while start <= current:
+        candles = _fold(_source_rows(interval, start, start + step), interval)
+        PriceCandle.objects.bulk_create(
+            candles,
+            update_conflicts=True,
+            unique_fields=["symbol", "interval", "bucket"],
+            update_fields=CANDLE_FIELDS,
+        )
+        updated += len(candles)
+        start += step
+
+    _set_watermark(interval, current)
+    return updated
+
+
+def purge(now=None):
+    '''
+    Удаление сырых курсов и мелких свечей старше срока хранения
+    '''
+    now = now or timezone.now()
+    deleted, _ = PriceTick.objects.filter(fetched_at__lt=now - TICK_RETENTION).delete()
+    for interval, retention in RETENTION.items():
+        count, _ = PriceCandle.objects.filter(interval=interval, bucket__lt=now - retention).delete()
+        deleted += count
+    return deleted
@@ -1,31 +1,125 @@
+import os
 import pika
 import json
 import logging
+import threading
 
-from rest_framework.response import Response
+from asgiref.sync import sync_to_async
+from pika.exceptions import AMQPError
 
 from django.conf import settings
 
+from apps.common import metrics
+
 logger = logging.getLogger(__name__)
 
+CRYPTO_TASKS_QUEUE = "crypto.tasks"
+
+
+class PublishError(Exception):
+    '''
+    Не удалось отправить задачу в очередь
+    '''
+
+
+class CryptoTaskPublisher:
+    '''
+    Долгоживущий издатель задач: одно соединение и один канал на процесс.
+    Очередь объявляется один раз на соединение, при обрыве соединение восстанавливается автоматически
+    '''
+
+    def __init__(self, url, queue=CRYPTO_TASKS_QUEUE, confirm=False, retries=1):
+        self.url = url
+        self.queue = queue
+        self.confirm = confirm      # ждать подтверждения от брокера (publisher confirms)
+        self.retries = retries      # количество переподключений при ошибке отправки
+        self._lock = threading.Lock()
+        self._connection = None
+        self._channel = None
+        self._pid = None
+
+    def _get_channel(self):
+        # После fork (gunicorn, celery) сокет родительского процесса использовать нельзя
+        if self._pid != os.getpid():
+            self._connection = self._channel = None
+            self._pid = os.getpid()
+
+        if self._channel is not None and self._channel.is_open:
+            return self._channel
+
+        self.close()
+        logger.info("Подключение к RabbitMQ")
+        self._connection = pika.BlockingConnection(pika.URLParameters(self.url))
+        self._channel = self._connection.channel()
+        self._channel.queue_declare(queue=self.queue, durable=True)
+        if self.confirm:
+            self._channel.confirm_delivery()
+        return self._channel
+
+    def publish(self, payload):
+        '''
+        Отправка одной задачи в очередь
+        '''
+        self.publish_batch([payload])
+
+    def publish_batch(self, payloads):
+        '''
+        Отправка нескольких задач в очередь через одно соединение
+        '''
+        bodies = [json.dumps(payload) for payload in payloads]
+
+        with metrics.timed(metrics.RABBITMQ_PUBLISH_LATENCY):
+            with self._lock:
+                for attempt in range(self.retries + 1):
+                    try:
+                        channel = self._get_channel()
+                        for body in bodies:
+                            channel.basic_publish(exchange="", routing_key=self.queue, body=body)
+                        return
+                    except (AMQPError, OSError) as e:
+                        logger.warning("Ошибка при отправке в RabbitMQ (попытка %s): %s", attempt + 1, e)
+                        self.close()
+                        error = e
+
+            logger.error("Не удалось отправить %s задач в очередь %s", len(bodies), self.queue, exc_info=error)
+            raise PublishError("Сервис очередей временно недоступен") from error
+
+    def close(self):
+        '''
+        Закрытие соединения без выброса исключений
+        '''
+        connection, self._connection, self._channel = self._connection, None, None
+        if connection is not None and connection.is_open:
+            try:
+                connection.close()
+            except (AMQPError, OSError):
+                pass
+
+
+publisher = CryptoTaskPublisher(settings.RABBITMQ_URL, confirm=settings.RABBITMQ_PUBLISHER_CONFIRMS)
+
+
 def publish_crypto_task(symbol: str):
     '''
     Отправка задачи в очередь
     '''
-    
-    logger.info(f"Отправка задачи {symbol} в очередь")
-    try:
-        conn = pika.BlockingConnection(pika.URLParameters(settings.RABBITMQ_URL))
-    except Exception as e:
-        logger.error(f"Ошибка при подключении к RabbitMQ: {str(e)}", exc_info=True)
-        return Response({"detail": "Сервис временно недоступен"}, status=503)
-    
-    ch = conn.channel()
-    ch.queue_declare(queue="crypto.tasks", durable=True)
-    ch.basic_publish(
-        exchange="",
-        routing_key="crypto.tasks",
-        body=json.dumps({"symbol": symbol})
-    )
-    conn.close()
-    logger.info(f"Задача {symbol} отправлена в очередь")
\ No newline at end of file
+    logger.debug("Отправка задачи %s в очередь", symbol)
+    publisher.publish({"symbol": symbol})
+    logger.info("Задача %s отправлена в очередь", symbol)
+
+
+def publish_crypto_tasks(symbols):
+    '''
+    Отправка одной задачи в очередь для нескольких символов
+    '''
+    logger.debug("Отправка задачи для %d символов в очередь", len(symbols))
+    publisher.publish({"symbols": list(symbols)})
+    logger.info("Задача для %d символов отправлена в очередь", len(symbols))
+
+
+async def apublish_crypto_tasks(symbols):
+    '''
+    Отправка задачи в очередь без блокировки event loop.
+    Публикация выполняется в отдельном потоке через постоянное соединение издателя
+    '''
+    await sync_to_async(publish_crypto_tasks, thread_sensitive=False)(symbols)
@@ -1,20 +1,316 @@
 from django.core.cache import caches
+from django.core.cache.backends.redis import RedisSerializer
+from django.conf import settings
+from django.utils.http import quote_etag
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+from typing import NamedTuple
+import asyncio
+import hashlib
+import json
 import logging
+import time
+import weakref
+
+from apps.common import metrics
 
 logger = logging.getLogger(__name__)
 
 crypto_cache = caches["crypto"]
 
+# Клиент без сериализации Django для работы со структурами Redis (hash, pipeline и т.д.)
+redis_client = Redis.from_url(settings.CACHES["crypto"]["LOCATION"], decode_responses=True)
+_serializer = RedisSerializer()  # сериализация значений как в кэше Django
+
+PRICE_SOFT_TTL = settings.CRYPTO_PRICE_SOFT_TTL  # после этого времени курс считается устаревшим (секунды)
+PRICE_HARD_TTL = settings.CRYPTO_PRICE_HARD_TTL  # после этого времени курс удаляется из кэша (секунды)
+
+
+class CachedPrice(NamedTuple):
+    """
+    Курс криптовалюты из кэша вместе со временем его получения,
+    ETag и готовым телом ответа на попадание в кэш
+    """
+    price: float
+    fetched_at: float
+    etag: str
+    body: bytes
+
+    @property
+    def age(self):
+        return max(time.time() - self.fetched_at, 0.0)
+
+    @property
+    def is_stale(self):
+        return self.age >= PRICE_SOFT_TTL
+
+
+def render_price(symbol, price, fetched_at):
+    '''
+    ETag и JSON-тело ответа на попадание в кэш, вычисляются один раз при записи курса
+    '''
+    etag = hashlib.md5(f"{symbol}:{price!r}:{fetched_at!r}".encode(), usedforsecurity=False).hexdigest()
+    body = json.dumps({"symbol": symbol, "price": price, "source": "cache"}, ensure_ascii=False, separators=(",", ":"))
+    return quote_etag(etag), body.encode()
+
+
+def _load_cached_price(symbol, value):
+    # Значения старого формата (просто число) без времени получения считаем отсутствующими
+    if not isinstance(value, dict) or value.get("price") is None:
+        return None
+    if "body" not in value:
+        value["etag"], value["body"] = render_price(symbol, value["price"], value["fetched_at"])
+    return CachedPrice(value["price"], value["fetched_at"], value["etag"], value["body"])
+
 
 def get_cached_price(symbol):
     '''
     Получение курса криптовалюты из кэша
     '''
-    logger.info(f"Получение курса криптовалюты {symbol} из кэша")
-    result = crypto_cache.get(f"crypto:{symbol}")
+    logger.debug("Получение курса криптовалюты %s из кэша", symbol)
+    result = _load_cached_price(symbol, crypto_cache.get(f"crypto:{symbol}"))
+    metrics.record_cache_lookups([result] if result else [], 1)
     if not result:
-        logger.info(f"Курс криптовалюты {symbol} не найден в кэше, обращение к API")
+        logger.info("Курс криптовалюты %s не найден в кэше, обращение к API", symbol)
         return None
     
-    logger.info(f"Курс криптовалюты {symbol} получен из кэша")
+    logger.debug("Курс криптовалюты %s получен из кэша", symbol)
     return result
+
+
+def get_cached_prices(symbols):
+    '''
+    Получение курсов нескольких криптовалют из кэша одним запросом (MGET)
+    '''
+    keys = {f"crypto:{symbol}": symbol for symbol in symbols}
+    cached = crypto_cache.get_many(list(keys))
+    prices = {keys[key]: entry for key, value in cached.items() if (entry := _load_cached_price(keys[key], value))}
+    metrics.record_cache_lookups(prices.values(), len(keys))
+    logger.debug("Из кэша получено %d из %d курсов криптовалют", len(prices), len(keys))
+    return prices
+
+
+REFRESH_LEASE_TTL = 10   # время жизни аренды на обновление курса (секунды)
+
+
+def _lease_key(symbol):
+    return f"crypto:{symbol}:inflight"
+
+
+def acquire_refresh_lease(symbol, ttl=REFRESH_LEASE_TTL):
+    '''
+    Захват аренды на обновление курса (SET NX с TTL).
+    Возвращает True, если обновление должен запустить текущий запрос
+    '''
+    return bool(redis_client.set(_lease_key(symbol), 1, nx=True, ex=ttl))
+
+
+def acquire_refresh_leases(symbols, ttl=REFRESH_LEASE_TTL):
+    '''
+    Захват аренды на обновление для нескольких символов одним pipeline.
+    Возвращает символы, для которых аренда получена текущим запросом
+    '''
+    pipe = redis_client.pipeline(transaction=False)
+    for symbol in symbols:
+        pipe.set(_lease_key(symbol), 1, nx=True, ex=ttl)
+    return [symbol for symbol, acquired in zip(symbols, pipe.execute()) if acquired]
+
+
+def release_refresh_leases(symbols):
+    '''
+    Снятие аренды на обновление курсов
+    '''
+    if symbols:
+        redis_client.delete(*(_lease_key(symbol) for symbol in symbols))
+
+
+def set_cached_price(symbol, price, timeout=PRICE_HARD_TTL):
+    '''
+    Сохранение курса криптовалюты в кэш со снятием аренды на обновление
+    '''
+    set_cached_prices({symbol: price}, timeout=timeout)
+
+
+def set_cached_prices(prices, timeout=PRICE_HARD_TTL):
+    '''
+    Сохранение курсов нескольких криптовалют в кэш одним pipeline со снятием аренды на обновление
+    и уведомлением подписчиков канала crypto:updates:{symbol}
+    '''
+    if not prices:
+        return
+    pipe = redis_client.pipeline(transaction=False)
+    _queue_price_writes(pipe, prices, timeout)
+    pipe.execute()
+
+
+def _queue_price_writes(pipe, prices, timeout):
+    # Запись в формате кэша Django, чтобы значения читались через crypto_cache
+    fetched_at = time.time()
+    for symbol, price in prices.items():
+        key = crypto_cache.make_and_validate_key(f"crypto:{symbol}")
+        etag, body = render_price(symbol, price, fetched_at)
+        value = {"price": price, "fetched_at": fetched_at, "etag": etag, "body": body}
+        pipe.set(key, _serializer.dumps(value), ex=timeout)
+    pipe.delete(*(_lease_key(symbol) for symbol in prices))
+    for symbol, price in prices.items():
+        pipe.publish(update_channel(symbol), json.dumps({"symbol": symbol, "price": price, "fetched_at": fetched_at}))
+
+
+def update_channel(symbol):
+    return f"crypto:updates:{symbol}"
+
+
+def parse_update(message):
+    data = json.loads(message["data"])
+    return _load_cached_price(data["symbol"], data)
+
+
+def wait_for_price(symbol, timeout):
+    '''
+    Ожидание записи курса обработчиком очереди (long-poll) не дольше timeout секунд
+    '''
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    try:
+        pubsub.subscribe(update_channel(symbol))
+        cached = get_cached_price(symbol)  # курс мог появиться до подписки
+        if cached and not cached.is_stale:
+            return cached
+
+        deadline = time.monotonic() + timeout
+        while (remaining := deadline - time.monotonic()) > 0:
+            message = pubsub.get_message(timeout=remaining)
+            if message:
+                return parse_update(message)
+        return None
+    finally:
+        pubsub.close()
+
+
+POPULARITY_KEY = "crypto:popularity"  # sorted set символ -> количество запросов (с затуханием)
+
+
+def record_requests(symbols):
+    '''
+    Учёт запросов символов в рейтинге популярности
+    '''
+    pipe = redis_client.pipeline(transaction=False)
+    for symbol in symbols:
+        pipe.zincrby(POPULARITY_KEY, 1, symbol)
+    pipe.execute()
+
+
+def get_popular_symbols(limit):
+    '''
+    Получение самых запрашиваемых символов
+    '''
+    return redis_client.zrevrange(POPULARITY_KEY, 0, limit - 1)
+
+
+def decay_popularity(factor, min_score=0.1):
+    '''
+    Затухание рейтинга популярности: счётчики умножаются на factor, редкие символы удаляются
+    '''
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.zunionstore(POPULARITY_KEY, {POPULARITY_KEY: factor})
+    pipe.zremrangebyscore(POPULARITY_KEY, "-inf", f"({min_score}")
+    pipe.execute()
+
+
+
+# Асинхронный доступ для ASGI. Встроенные aget/aget_many у RedisCache выполняют синхронные запросы
+# в потоке через sync_to_async, поэтому читаем те же ключи напрямую через redis.asyncio,
+# используя формирование ключей и сериализацию кэша Django
+_async_clients = weakref.WeakKeyDictionary()  # клиент привязан к event loop, в котором создан
+
+
+def get_async_client():
+    '''
+    Асинхронный клиент Redis для текущего event loop (ответы не декодируются)
+    '''
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncRedis.from_url(settings.CACHES["crypto"]["LOCATION"])
+    return client
+
+
+async def aget_cached_price(symbol):
+    '''
+    Асинхронное получение курса криптовалюты из кэша
+    '''
+    return (await aget_cached_prices([symbol])).get(symbol)
+
+
+async def aget_cached_prices(symbols):
+    '''
+    Асинхронное получение курсов нескольких криптовалют из кэша одним запросом (MGET)
+    '''
+    keys = [crypto_cache.make_and_validate_key(f"crypto:{symbol}") for symbol in symbols]
+    values = await get_async_client().mget(keys)
+    prices = {
+        symbol: entry
+        for symbol, value in zip(symbols, values)
+        if value is not None and (entry := _load_cached_price(symbol, _serializer.loads(value)))
+    }
+    metrics.record_cache_lookups(prices.values(), len(keys))
+    return prices
+
+
+async def aset_cached_prices(prices, timeout=PRICE_HARD_TTL):
+    '''
+    Асинхронное сохранение курсов в кэш одним pipeline со снятием аренды на обновление
+    '''
+    if not prices:
+        return
+    pipe = get_async_client().pipeline(transaction=False)
+    _queue_price_writes(pipe, prices, timeout)
+    await pipe.execute()
+
+
+async def await_price(symbol, timeout):
+    '''
+    Асинхронное ожидание записи курса обработчиком очереди (long-poll) не дольше timeout секунд
+    '''
+    pubsub = get_async_client().pubsub(ignore_subscribe_messages=True)
+    try:
+        await pubsub.subscribe(update_channel(symbol))
+        cached = await aget_cached_price(symbol)  # курс мог появиться до подписки
+        if cached and not cached.is_stale:
+            return cached
+
+        deadline = time.monotonic() + timeout
+        while (remaining := deadline - time.monotonic()) > 0:
+            message = await pubsub.get_message(timeout=remaining)
+            if message:
+                return parse_update(message)
+        return None
+    finally:
+        await pubsub.aclose()
+
+
+async def aacquire_refresh_leases(symbols, ttl=REFRESH_LEASE_TTL):
+    '''
+    Асинхронный захват аренды на обновление для нескольких символов одним pipeline
+    '''
+    pipe = get_async_client().pipeline(transaction=False)
+    for symbol in symbols:
+        pipe.set(_lease_key(symbol), 1, nx=True, ex=ttl)
+    return [symbol for symbol, acquired in zip(symbols, await pipe.execute()) if acquired]
+
+
+async def arelease_refresh_leases(symbols):
+    '''
+    Асинхронное снятие аренды на обновление курсов
+    '''
+    if symbols:
+        await get_async_client().delete(*(_lease_key(symbol) for symbol in symbols))
+
+
+async def arecord_requests(symbols):
+    '''
+    Асинхронный учёт запросов символов в рейтинге популярности
+    '''
+    pipe = get_async_client().pipeline(transaction=False)
+    for symbol in symbols:
+        pipe.zincrby(POPULARITY_KEY, 1, symbol)
+    await pipe.execute()
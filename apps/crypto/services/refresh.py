@@ -0,0 +1,57 @@
+import logging
+
+from asgiref.sync import sync_to_async
+
+from apps.crypto.services import coingecko, history, redis
+from apps.crypto.services.symbols import get_symbol_map
+
+logger = logging.getLogger(__name__)
+
+
+def _record_history(prices):
+    if prices:
+        try:
+            history.record_ticks(prices)  # история не должна мешать обновлению кэша
+        except Exception as e:
+            logger.error("Ошибка при сохранении истории курсов: %s", e, exc_info=True)
+
+
+def store_prices(prices, timeout=redis.PRICE_HARD_TTL):
+    '''
+    Запись полученных курсов в кэш и в историю (PriceTick), из которой строятся свечи.
+    Все пути получения курса, включая dev fallback, сохраняют его через эту функцию
+    '''
+    redis.set_cached_prices(prices, timeout=timeout)
+    _record_history(prices)
+
+
+async def astore_prices(prices, timeout=redis.PRICE_HARD_TTL):
+    '''
+    Асинхронный вариант store_prices
+    '''
+    await redis.aset_cached_prices(prices, timeout=timeout)
+    await sync_to_async(_record_history)(prices)
+
+
+def refresh_prices(symbols, timeout=redis.PRICE_HARD_TTL):
+    '''
+    Обновление курсов нескольких символов одним запросом к CoinGecko и запись их в кэш одним pipeline.
+    Для символов без курса снимается аренда на обновление, чтобы следующий запрос мог повторить попытку,
+    поэтому вызывающий должен владеть арендой всех symbols (захватить её сам или получить задачу от её владельца)
+    '''
+    symbols = list(dict.fromkeys(symbols))
+    symbol_map = get_symbol_map()
+    ids = {symbol_map[symbol]: symbol for symbol in symbols if symbol in symbol_map}
+
+    try:
+        fetched = coingecko.fetch_prices(ids)
+    except Exception:
+        redis.release_refresh_leases(symbols)
+        raise
+
+    prices = {ids[coingecko_id]: price for coingecko_id, price in fetched.items()}
+    store_prices(prices, timeout=timeout)
+    redis.release_refresh_leases([symbol for symbol in symbols if symbol not in prices])
+
+    logger.info("Обновлено %s из %s курсов", len(prices), len(symbols))
+    return prices
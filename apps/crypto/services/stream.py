@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import weakref
+
+from apps.crypto.services import redis
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 100  # максимальное количество неотправленных событий для одного клиента
+
+
+class PriceBroadcaster:
+    '''
+    Одна подписка Redis pub/sub (PSUBSCRIBE crypto:updates:*) на процесс,
+    обновления курсов раздаются в очереди подключённых клиентов
+    '''
+
+    def __init__(self):
+        self._subscribers = {}  # символ -> множество очередей клиентов
+        self._task = None
+
+    def subscribe(self, symbols):
+        '''
+        Регистрация клиента, возвращает очередь с парами (символ, CachedPrice)
+        '''
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        for symbol in symbols:
+            self._subscribers.setdefault(symbol, set()).add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._listen())
+        return queue
+
+    def unsubscribe(self, queue, symbols):
+        for symbol in symbols:
+            queues = self._subscribers.get(symbol)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[symbol]
+
+    def _publish(self, symbol, entry):
+        for queue in self._subscribers.get(symbol, ()):
+            if queue.full():
+                queue.get_nowait()  # медленный клиент получает только последние обновления
+            queue.put_nowait((symbol, entry))
+
+    async def _listen(self):
+        prefix = redis.update_channel("")
+        while True:
+            pubsub = redis.get_async_client().pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.psubscribe(f"{prefix}*")
+                logger.info("Подписка на обновления курсов установлена")
+                async for message in pubsub.listen():
+                    if message["type"] == "pmessage":
+                        symbol = message["channel"].decode().removeprefix(prefix)
+                        self._publish(symbol, redis.parse_update(message))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка подписки на обновления курсов: {str(e)}", exc_info=True)
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+_broadcasters = weakref.WeakKeyDictionary()  # рассыльщик привязан к event loop, в котором создан
+
+
+def get_broadcaster():
+    loop = asyncio.get_running_loop()
+    broadcaster = _broadcasters.get(loop)
+    if broadcaster is None:
+        broadcaster = _broadcasters[loop] = PriceBroadcaster()
+    return broadcaster
@@ -0,0 +1,102 @@
+import logging
+import threading
+import time
+from types import MappingProxyType
+
+from apps.crypto.services.redis import redis_client, get_async_client
+
+logger = logging.getLogger(__name__)
+
+SYMBOL_MAP_KEY = "crypto:symbol_map"                  # hash символ -> coingecko_id
+SYMBOL_MAP_VERSION_KEY = "crypto:symbol_map:version"  # версия реестра, увеличивается при каждой записи, без TTL
+SYMBOL_MAP_TTL = 7 * 86400                            # неделя: реестр переживает несколько неудачных ежедневных обновлений
+VERSION_CHECK_INTERVAL = 1.0                          # как часто процесс сверяет версию с Redis (секунды)
+
+_lock = threading.Lock()
+_symbol_map = MappingProxyType({})
+_version = None
+_checked_at = 0.0
+
+
+def _version_checked_recently():
+    return time.monotonic() - _checked_at < VERSION_CHECK_INTERVAL
+
+
+def _store(version, symbol_map):
+    # symbol_map=None - версия не изменилась, отмечается только время проверки.
+    # Этот вызов выполняется без блокировки, поэтому он никогда не заменяет реестр
+    global _symbol_map, _version, _checked_at
+
+    if symbol_map is None:
+        _checked_at = time.monotonic()
+        return _symbol_map
+
+    if version != _version:
+        _symbol_map = MappingProxyType(symbol_map if version else {})
+        _version = version
+        logger.info("Реестр символов обновлён до версии %s: %s символов", version, len(_symbol_map))
+    _checked_at = time.monotonic()
+    return _symbol_map
+
+
+def get_symbol_map():
+    '''
+    Получение реестра поддерживаемых символов.
+    Возвращает неизменяемую локальную копию, которая перечитывается из Redis только при смене версии
+    '''
+    if _version_checked_recently():
+        return _symbol_map
+
+    version = redis_client.get(SYMBOL_MAP_VERSION_KEY)
+    if version == _version:
+        return _store(version, None)
+
+    with _lock:
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.get(SYMBOL_MAP_VERSION_KEY)
+        pipe.hgetall(SYMBOL_MAP_KEY)
+        return _store(*pipe.execute())  # версия и содержимое читаются атомарно
+
+
+async def aget_symbol_map():
+    '''
+    Асинхронное получение реестра поддерживаемых символов
+    '''
+    if _version_checked_recently():
+        return _symbol_map
+
+    client = get_async_client()
+    version = await client.get(SYMBOL_MAP_VERSION_KEY)
+    version = version.decode() if version else None
+    if version == _version:
+        return _store(version, None)
+
+    pipe = client.pipeline(transaction=True)
+    pipe.get(SYMBOL_MAP_VERSION_KEY)
+    pipe.hgetall(SYMBOL_MAP_KEY)
+    version, symbol_map = await pipe.execute()
+    return _store(
+        version.decode() if version else None,
+        {key.decode(): value.decode() for key, value in symbol_map.items()},
+    )
+
+
+def save_symbol_map(symbol_map):
+    '''
+    Атомарная замена реестра символов в Redis с увеличением версии
+    '''
+    if not symbol_map:
+        raise ValueError("Реестр символов пуст")
+
+    tmp_key = f"{SYMBOL_MAP_KEY}:tmp"
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(tmp_key)
+    pipe.hset(tmp_key, mapping=symbol_map)
+    pipe.rename(tmp_key, SYMBOL_MAP_KEY)
+    pipe.expire(SYMBOL_MAP_KEY, SYMBOL_MAP_TTL)
+    # Версия хранится без TTL: после истечения INCR начал бы снова с 1 и мог совпасть с версией в памяти процессов
+    pipe.incr(SYMBOL_MAP_VERSION_KEY)
+    pipe.persist(SYMBOL_MAP_VERSION_KEY)  # снимает TTL, выставленный прежними версиями кода
+    version = pipe.execute()[4]
+    logger.info("Реестр символов сохранён, версия %s: %s символов", version, len(symbol_map))
+    return version
@@ -1,34 +1,95 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
-import json
-from django.core.cache import caches
 from celery import shared_task
+from django.utils import timezone
+
+from apps.crypto.services import coingecko, history, redis
+from apps.crypto.services.refresh import refresh_prices
+from apps.crypto.services.symbols import save_symbol_map
+
+logger = logging.getLogger(__name__)
+
+PER_PAGE = 250  # максимальный размер страницы /coins/markets
+
+
+def fetch_markets_page(page):
+    '''
+    Получение одной страницы /coins/markets в виде списка пар (символ, coingecko_id).
+    :raises ValueError: если ответ не список монет (например, объект ошибки или лимита с кодом 200)
+    '''
+    params = {
+        "vs_currency": "usd",
+        "order": "market_cap_desc",
+        "per_page": PER_PAGE,
+        "page": page,
+        "sparkline": False
+    }
+    data = coingecko.get("/coins/markets", params=params)
+    if not isinstance(data, list):
+        raise ValueError(f"Неожиданный ответ /coins/markets на странице {page}: {str(data)[:200]}")
+
+    coins = []
+    for entry in data:
+        if not (isinstance(entry, dict) and isinstance(entry.get("symbol"), str) and isinstance(entry.get("id"), str)):
+            raise ValueError(f"Неожиданная запись /coins/markets на странице {page}: {str(entry)[:200]}")
+        coins.append((entry["symbol"].upper(), entry["id"]))
+    return coins
 
 
 @shared_task
-def fetch_supported_symbols(pages=4):
+def fetch_supported_symbols(pages=4, workers=8):
     '''
-    Получение symbol_map из CoinGecko /coins/markets (по страницам)
+    Получение symbol_map из CoinGecko /coins/markets (страницы загружаются параллельно).
+    Реестр заменяется только если получены все страницы, иначе остаётся предыдущий
     '''
-    url = "https://api.coingecko.com/api/v3/coins/markets"
-    symbol_map = {}
+    try:
+        with ThreadPoolExecutor(max_workers=min(workers, pages)) as executor:
+            results = list(executor.map(fetch_markets_page, range(1, pages + 1)))
+    except (requests.RequestException, ValueError) as e:
+        logger.error("Ошибка при загрузке symbol_map, используется предыдущий: %s", e, exc_info=True)
+        return "symbol_map fetch failed, previous map kept"
 
-    for page in range(1, pages + 1):
-        params = {
-            "vs_currency": "usd",
-            "order": "market_cap_desc",
-            "per_page": 250,
-            "page": page,
-            "sparkline": False
-        }
-        response = requests.get(url, params=params)
-        if response.status_code != 200:
-            continue
-
-        data = response.json()
-        for entry in data:
-            symbol = entry["symbol"].upper()
+    symbol_map = {}
+    for coins in results:  # страницы обходятся по порядку капитализации
+        for symbol, coingecko_id in coins:
             if symbol not in symbol_map:  # берём только первого (с большим cap'ом)
-                symbol_map[symbol] = entry["id"]
+                symbol_map[symbol] = coingecko_id
+
+    if not symbol_map:
+        return "symbol_map is empty, nothing saved"
 
-    caches["crypto"].set("symbol_map", json.dumps(symbol_map), timeout=86400)  # кэшируем на 24 часа
+    save_symbol_map(symbol_map)  # хранится в Redis неделю (SYMBOL_MAP_TTL)
     return f"{len(symbol_map)} symbols saved"
+
+
+@shared_task
+def prewarm_popular_symbols(top_k=100, decay=0.9):
+    '''
+    Обновление курсов самых запрашиваемых символов до истечения их срока жизни в кэше.
+    Остальные символы обновляются по запросу
+    '''
+    symbols = redis.get_popular_symbols(top_k)
+    redis.decay_popularity(decay)
+    if not symbols:
+        return "no popular symbols"
+
+    # Символы, которые уже обновляются по запросу, пропускаются: их аренду снимет только её владелец
+    symbols = redis.acquire_refresh_leases(symbols)
+    if not symbols:
+        return "all popular symbols are already being refreshed"
+
+    prices = refresh_prices(symbols)
+    return f"{len(prices)} prices prewarmed"
+
+
+@shared_task
+def rollup_price_history():
+    '''
+    Построение свечей 1m/1h/1d из сохранённых курсов и удаление устаревших данных
+    '''
+    now = timezone.now()
+    counts = {interval: history.rollup(interval, now) for interval in history.INTERVALS}  # по возрастанию интервала
+    deleted = history.purge(now)
+    return f"candles updated: {counts}, rows purged: {deleted}"
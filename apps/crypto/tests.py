@@ -1,3 +1,125 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.crypto import views
+from apps.crypto.services import redis, symbols
+
+SYMBOL = "TESTCOIN"  # символ, которого нет в CoinGecko: тесты не затрагивают настоящие курсы в кэше
+SYMBOL_MAP = {SYMBOL: "test-coin", "BTC": "bitcoin", "ETH": "ethereum"}
+
+
+def authenticated_client():
+    # Вне DEBUG курсы доступны только аутентифицированным пользователям, запись в БД для этого не нужна
+    client = APIClient()
+    client.force_authenticate(User(email="test@example.com"))
+    return client
+
+
+@override_settings(RATELIMIT_ENABLE=False, API_ALLOW_FALLBACK=False)
+class CryptoPriceETagTests(SimpleTestCase):
+    """
+    Условные запросы к курсу из кэша: ETag, Last-Modified и ответ 304
+    """
+
+    def setUp(self):
+        self.client = authenticated_client()
+        patcher = mock.patch.object(symbols, "get_symbol_map", return_value=SYMBOL_MAP)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self._clear_cache)
+        redis.set_cached_price(SYMBOL, 123.45)
+        self.url = reverse("crypto-price", args=[SYMBOL.lower()])
+
+    @staticmethod
+    def _clear_cache():
+        redis.crypto_cache.delete(f"crypto:{SYMBOL}")
+        redis.redis_client.zrem(redis.POPULARITY_KEY, SYMBOL)
+
+    def test_cached_price_has_validators(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"symbol": SYMBOL, "price": 123.45, "source": "cache"})
+        self.assertTrue(response["ETag"].startswith('"'))
+        self.assertIn("Last-Modified", response)
+        self.assertTrue(response["Cache-Control"].startswith("max-age="))
+
+    def test_matching_etag_returns_304(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+    def test_if_modified_since_returns_304(self):
+        last_modified = self.client.get(self.url)["Last-Modified"]
+
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_price_changes_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        redis.set_cached_price(SYMBOL, 200.0)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["price"], 200.0)
+
+
+@override_settings(RATELIMIT_ENABLE=False, API_ALLOW_FALLBACK=False)
+class CryptoPricesValidationTests(SimpleTestCase):
+    """
+    Проверка символов пакетного запроса до обращения к кэшу курсов
+    """
+
+    def setUp(self):
+        self.client = authenticated_client()
+        patcher = mock.patch.object(symbols, "get_symbol_map", return_value=SYMBOL_MAP)
+        self.get_symbol_map = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(redis, "get_cached_prices")
+        self.get_cached_prices = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = reverse("crypto-prices")
+
+    def test_parse_symbols(self):
+        self.assertEqual(views.parse_symbols(" btc,ETH,,Btc , eth"), ["BTC", "ETH"])
+
+    def test_symbols_required(self):
+        response = self.client.get(self.url, {"symbols": " , "})
+
+        self.assertEqual(response.status_code, 400)
+        self.get_symbol_map.assert_not_called()
+
+    def test_too_many_symbols(self):
+        requested = ",".join(f"S{i}" for i in range(views.MAX_BATCH_SYMBOLS + 1))
+
+        response = self.client.get(self.url, {"symbols": requested})
+
+        self.assertEqual(response.status_code, 400)
+        self.get_symbol_map.assert_not_called()
+
+    def test_unsupported_symbols_listed(self):
+        response = self.client.get(self.url, {"symbols": "btc,DOGE,eth,XYZ"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"detail": "Символы не поддерживаются: DOGE, XYZ"})
+        self.get_symbol_map.assert_called_once()
+        self.get_cached_prices.assert_not_called()
+
+    def test_empty_symbol_map(self):
+        self.get_symbol_map.return_value = {}
+
+        response = self.client.get(self.url, {"symbols": "BTC"})
+
+        self.assertEqual(response.status_code, 503)
+        self.get_cached_prices.assert_not_called()
@@ -1,7 +1,22 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import views, async_views
+
+# При развёртывании через ASGI (core/asgi.py) используются асинхронные варианты представлений
+if settings.CRYPTO_ASYNC_VIEWS:
+    price_view = async_views.AsyncCryptoPriceView
+    prices_view = async_views.AsyncCryptoPricesView
+else:
+    price_view = views.CryptoPriceAPIView
+    prices_view = views.CryptoPricesAPIView
 
 urlpatterns = [
-    path("price/<str:symbol>/", views.CryptoPriceAPIView.as_view(), name="crypto-price"),
-]
\ No newline at end of file
+    path("price/<str:symbol>/", price_view.as_view(), name="crypto-price"),
+    path("prices/", prices_view.as_view(), name="crypto-prices"),
+    path("ohlc/<str:symbol>/", views.CryptoOHLCAPIView.as_view(), name="crypto-ohlc"),
+]
+
+# SSE-поток держит соединение открытым и работает только под ASGI
+if settings.CRYPTO_ASYNC_VIEWS:
+    urlpatterns.append(path("stream/", async_views.AsyncCryptoStreamView.as_view(), name="crypto-stream"))
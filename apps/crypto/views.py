@@ -1,19 +1,86 @@
 import logging
 from rest_framework.views import APIView
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from drf_spectacular.types import OpenApiTypes
 from rest_framework.response import Response
-from apps.crypto.services import redis, rabbitmq, debug_utils
-import json
-from django.core.cache import caches
+from apps.crypto.services import redis, rabbitmq, debug_utils, symbols, history, refresh
+from apps.crypto.models import PriceCandle
+from apps.crypto.serializers import PriceCandleSerializer, OHLCQuerySerializer
 from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date
 from rest_framework.permissions import AllowAny, IsAuthenticated
 
+from apps.common.ratelimit import rate_limit
+
 tag = 'Курсы криптовалют'
-crypto_cache = caches["crypto"]
+
+MAX_BATCH_SYMBOLS = 200  # Максимальное количество символов в одном пакетном запросе
+MAX_WAIT_SECONDS = 10    # Максимальное время ожидания курса в режиме long-poll (?wait=N)
+MAX_CANDLES = 1000       # Максимальное количество свечей в одном ответе
+
+# Ограничение запросов к курсам (в том числе асинхронным представлениям): на пользователя и на IP-адрес
+price_rate_limit = method_decorator(rate_limit(user="600/m", ip="1200/m"), name="get")
 
 logger = logging.getLogger(__name__)
 
 
+def parse_symbols(raw):
+    '''
+    Разбор списка символов из строки "BTC,eth, ..." без дубликатов с сохранением порядка
+    '''
+    return list(dict.fromkeys(s.strip().upper() for s in raw.split(",") if s.strip()))
+
+
+def parse_wait(raw):
+    '''
+    Разбор параметра ?wait=N, возвращает None для некорректного значения
+    '''
+    try:
+        return min(max(float(raw or 0), 0.0), MAX_WAIT_SECONDS)
+    except ValueError:
+        return None
+
+
+def cache_headers(cached):
+    '''
+    Заголовки для условных запросов: ETag по курсу и времени его получения,
+    Cache-Control на оставшееся до устаревания курса время
+    '''
+    return {
+        "ETag": cached.etag,
+        "Last-Modified": http_date(cached.fetched_at),
+        "Cache-Control": f"max-age={max(int(redis.PRICE_SOFT_TTL - cached.age), 0)}",
+    }
+
+
+def conditional_response(request, cached, headers):
+    '''
+    Ответ 304 без тела, если у клиента уже есть эта версия курса (If-None-Match / If-Modified-Since),
+    иначе None
+    '''
+    response = get_conditional_response(request, etag=headers["ETag"], last_modified=int(cached.fetched_at))
+    if response is not None:
+        for header, value in headers.items():
+            response[header] = value
+    return response
+
+
+def cached_response(request, cached):
+    '''
+    Ответ на попадание в кэш: 304 при совпадении версии или готовое тело из кэша
+    без рендеринга DRF (аутентификация и проверка прав к этому моменту уже выполнены)
+    '''
+    headers = cache_headers(cached)
+    return conditional_response(request, cached, headers) or HttpResponse(
+        cached.body, content_type="application/json", headers=headers,
+    )
+
+
+@price_rate_limit
 class CryptoPriceAPIView(APIView):
     # При тестировании и разработки доступно всем, при необходимости можно ограничить доступ только аутентифицированным
     permission_classes = [AllowAny] if settings.DEBUG else [IsAuthenticated]
@@ -21,13 +88,25 @@ class CryptoPriceAPIView(APIView):
     @extend_schema(
         summary="Получение курса криптовалюты",
         description="Эндпоинт для получения курса криптовалюты",
+        parameters=[
+            OpenApiParameter(
+                name="wait",
+                type=OpenApiTypes.NUMBER,
+                location=OpenApiParameter.QUERY,
+                required=False,
+                description=f"Ожидать появления курса до N секунд (не больше {MAX_WAIT_SECONDS}) вместо ответа 202",
+            ),
+        ],
         tags=[tag],
     )
     def get(self, request, symbol):
         symbol = symbol.upper()
 
-        raw = caches["crypto"].get("symbol_map")
-        SUPPORTED_SYMBOLS = json.loads(raw) if raw else {}
+        wait = parse_wait(request.GET.get("wait"))
+        if wait is None:
+            return Response({"detail": "Параметр wait должен быть числом"}, status=400)
+
+        SUPPORTED_SYMBOLS = symbols.get_symbol_map()
 
         if not SUPPORTED_SYMBOLS:
             return Response({"detail": "Символы временно недоступны"}, status=503)
@@ -35,26 +114,163 @@ class CryptoPriceAPIView(APIView):
         if symbol not in SUPPORTED_SYMBOLS:
             return Response({"detail": f"Символ не поддерживается: {symbol}"}, status=400)
 
-        price = redis.get_cached_price(symbol)
+        redis.record_requests([symbol])
+
+        cached = redis.get_cached_price(symbol)
 
-        if price:
-            return Response({"symbol": symbol, "price": price, "source": "cache"})
+        if cached and not cached.is_stale:
+            return cached_response(request, cached)
 
-        # Для тестирования при разработке
-        if settings.API_ALLOW_FALLBACK:
-            logger.info(f"DEBUG mode: {settings.DEBUG}, Fallback: {settings.API_ALLOW_FALLBACK}, Permissions: {[p.__name__ for p in self.permission_classes]}")
+        # Устаревший курс отдаём сразу, а обновление запускаем в фоне (stale-while-revalidate)
+        if cached:
+            if redis.acquire_refresh_lease(symbol):
+                try:
+                    rabbitmq.publish_crypto_task(symbol)
+                except rabbitmq.PublishError:
+                    redis.release_refresh_leases([symbol])
+            headers = cache_headers(cached)
+            return conditional_response(request, cached, headers) or Response(
+                {"symbol": symbol, "price": cached.price, "source": "stale-cache", "age": round(cached.age, 1)},
+                headers=headers,
+            )
+
+        # Обновление запускает только первый запрос, остальные не отправляют задачу и не ходят в API
+        if redis.acquire_refresh_lease(symbol):
+            # Для тестирования при разработке
+            if settings.API_ALLOW_FALLBACK:
+                logger.debug("DEBUG mode: %s, Fallback: %s, Permissions: %s", settings.DEBUG, settings.API_ALLOW_FALLBACK, [p.__name__ for p in self.permission_classes])
 
-            if not price:
                 price = debug_utils.fetch_direct_price(symbol, SUPPORTED_SYMBOLS)
 
-            if price is not None:
-                crypto_cache.set(f"crypto:{symbol}", price, timeout=60)  # Кэшируем на 1 минуту только если получили цену, закомментировать при необходимости
-                return Response({
-                    "symbol": symbol,
-                    "price": price,
-                    "source": "coingecko (dev fallback)"
-                },
-                    status=200)
+                if price is not None:
+                    refresh.store_prices({symbol: price})  # Кэшируем только если получили цену, закомментировать при необходимости
+                    return Response({
+                        "symbol": symbol,
+                        "price": price,
+                        "source": "coingecko (dev fallback)"
+                    },
+                        status=200)
+
+            try:
+                rabbitmq.publish_crypto_task(symbol)
+            except rabbitmq.PublishError:
+                redis.release_refresh_leases([symbol])  # Даём следующему запросу повторить попытку
+                return Response({"detail": "Сервис временно недоступен"}, status=503)
+
+        # Режим long-poll: ждём, пока обработчик очереди запишет курс
+        if wait:
+            cached = redis.wait_for_price(symbol, wait)
+            if cached:
+                return cached_response(request, cached)
 
-        rabbitmq.publish_crypto_task(symbol)
         return Response({"status": "pending", "retry_after": 3}, status=202)
+
+
+@price_rate_limit
+class CryptoPricesAPIView(APIView):
+    # При тестировании и разработки доступно всем, при необходимости можно ограничить доступ только аутентифицированным
+    permission_classes = [AllowAny] if settings.DEBUG else [IsAuthenticated]
+
+    @extend_schema(
+        summary="Получение курсов нескольких криптовалют",
+        description="Эндпоинт для получения курсов нескольких криптовалют одним запросом",
+        parameters=[
+            OpenApiParameter(
+                name="symbols",
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description="Символы криптовалют через запятую, например BTC,ETH",
+            ),
+        ],
+        tags=[tag],
+    )
+    def get(self, request):
+        requested = parse_symbols(request.GET.get("symbols", ""))
+
+        if not requested:
+            return Response({"detail": "Не переданы символы"}, status=400)
+
+        if len(requested) > MAX_BATCH_SYMBOLS:
+            return Response({"detail": f"Слишком много символов, максимум {MAX_BATCH_SYMBOLS}"}, status=400)
+
+        SUPPORTED_SYMBOLS = symbols.get_symbol_map()
+
+        if not SUPPORTED_SYMBOLS:
+            return Response({"detail": "Символы временно недоступны"}, status=503)
+
+        unsupported = [symbol for symbol in requested if symbol not in SUPPORTED_SYMBOLS]
+        if unsupported:
+            return Response({"detail": f"Символы не поддерживаются: {', '.join(unsupported)}"}, status=400)
+
+        redis.record_requests(requested)
+
+        cached = redis.get_cached_prices(requested)
+        results = {}
+        for symbol, entry in cached.items():
+            if entry.is_stale:
+                results[symbol] = {"price": entry.price, "status": "stale", "age": round(entry.age, 1)}
+            else:
+                results[symbol] = {"price": entry.price, "status": "cached"}
+
+        missing = [symbol for symbol in requested if symbol not in cached]
+        stale = [symbol for symbol, entry in cached.items() if entry.is_stale]
+
+        # Обновляем только символы, для которых ещё никто не запустил обновление
+        to_refresh = redis.acquire_refresh_leases(missing + stale) if missing or stale else []
+
+        # Для тестирования при разработке, устаревшие курсы обновляются только в фоне
+        to_fetch = [symbol for symbol in to_refresh if symbol not in cached]
+        if to_fetch and settings.API_ALLOW_FALLBACK:
+            fetched = debug_utils.fetch_direct_prices(to_fetch, SUPPORTED_SYMBOLS)
+            if fetched:
+                refresh.store_prices(fetched)
+                results.update({symbol: {"price": price, "status": "cached"} for symbol, price in fetched.items()})
+                missing = [symbol for symbol in missing if symbol not in fetched]
+                to_refresh = [symbol for symbol in to_refresh if symbol not in fetched]
+
+        data = {"results": {symbol: results.get(symbol, {"price": None, "status": "pending"}) for symbol in requested}}
+
+        if to_refresh:
+            try:
+                rabbitmq.publish_crypto_tasks(to_refresh)  # Одно сообщение на все промахи кэша
+            except rabbitmq.PublishError:
+                redis.release_refresh_leases(to_refresh)
+                if missing:
+                    return Response({"detail": "Сервис временно недоступен"}, status=503)
+
+        if missing:
+            data["retry_after"] = 3
+
+        return Response(data)
+
+
+@price_rate_limit
+class CryptoOHLCAPIView(APIView):
+    # При тестировании и разработки доступно всем, при необходимости можно ограничить доступ только аутентифицированным
+    permission_classes = [AllowAny] if settings.DEBUG else [IsAuthenticated]
+
+    @extend_schema(
+        summary="Свечи OHLC по криптовалюте",
+        description="Эндпоинт для получения свечей 1m/1h/1d за период из предварительно агрегированных данных",
+        parameters=[OHLCQuerySerializer],
+        responses=PriceCandleSerializer(many=True),
+        tags=[tag],
+    )
+    def get(self, request, symbol):
+        symbol = symbol.upper()
+
+        query = OHLCQuerySerializer(data=request.GET)
+        query.is_valid(raise_exception=True)
+        interval = query.validated_data["interval"]
+        end = query.validated_data.get("end") or timezone.now()
+        start = query.validated_data.get("start") or end - history.INTERVALS[interval] * MAX_CANDLES
+
+        candles = PriceCandle.objects.filter(
+            symbol=symbol, interval=interval, bucket__gte=start, bucket__lte=end,
+        ).order_by("bucket")[:MAX_CANDLES]
+
+        return Response({
+            "symbol": symbol,
+            "interval": interval,
+            "candles": PriceCandleSerializer(candles, many=True).data,
+        })
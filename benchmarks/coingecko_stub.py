@@ -0,0 +1,58 @@
+import json
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+KNOWN_COINS = [("bitcoin", "btc"), ("ethereum", "eth"), ("solana", "sol"), ("dogecoin", "doge")]
+
+
+def stub_price(coingecko_id):
+    '''
+    Детерминированный курс для id монеты, чтобы результаты запусков совпадали
+    '''
+    return round(zlib.crc32(coingecko_id.encode()) % 100000 / 7, 2)
+
+
+class CoinGeckoStubHandler(BaseHTTPRequestHandler):
+    """
+    Ответы в формате /simple/price и /coins/markets без обращения к сети
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+
+        if url.path == "/simple/price":
+            currency = params.get("vs_currencies", ["usd"])[0]
+            ids = [i for i in params.get("ids", [""])[0].split(",") if i]
+            data = {coingecko_id: {currency: stub_price(coingecko_id)} for coingecko_id in ids}
+        elif url.path == "/coins/markets":
+            page = int(params.get("page", ["1"])[0])
+            per_page = int(params.get("per_page", ["250"])[0])
+            data = [{"id": f"coin-{page}-{i}", "symbol": f"c{page}x{i}"} for i in range(per_page)]
+            if page == 1:
+                data[:len(KNOWN_COINS)] = [{"id": coin_id, "symbol": symbol} for coin_id, symbol in KNOWN_COINS]
+        else:
+            self.send_error(404)
+            return
+
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(host="127.0.0.1", port=0):
+    '''
+    Запуск заглушки CoinGecko в фоновом потоке, возвращает сервер (адрес в server.server_address)
+    '''
+    server = ThreadingHTTPServer((host, port), CoinGeckoStubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,87 @@
+'''
+Сравнение способов отправки писем на локальной SMTP-заглушке:
+новое соединение на каждое письмо (прежний send_mail), постоянное соединение PooledSMTPEmailBackend
+и очередь писем с отправкой пачками (flush_mail_queue).
+
+Запуск из корня проекта (нужен локальный Redis, база BENCH_REDIS_URL очищается перед запуском):
+    python benchmarks/mail_delivery.py --messages 500 --connect-delay 0.05
+
+--connect-delay - задержка заглушки перед приветствием, имитирует STARTTLS и авторизацию на реальном сервере
+'''
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.core.mail import send_mail
+
+from apps.accounts import mail
+from apps.accounts.tasks import flush_mail_queue
+from apps.common.mail import close_shared_connection
+from benchmarks.smtp_sink import start_sink
+
+SMTP_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+POOLED_BACKEND = "apps.common.mail.PooledSMTPEmailBackend"
+
+
+def send_each(count):
+    for i in range(count):
+        send_mail(f"Письмо {i}", "Текст письма", settings.DEFAULT_FROM_EMAIL, [f"user{i}@example.com"])
+
+
+def send_queued(count):
+    for i in range(count):
+        mail.enqueue(f"Письмо {i}", "Текст письма", [f"user{i}@example.com"])
+    result = flush_mail_queue()
+    if result["sent"] != count:
+        raise RuntimeError(f"отправлено {result['sent']} из {count}: {result}")
+
+
+MODES = [
+    ("smtp", SMTP_BACKEND, send_each),          # новое соединение на каждое письмо
+    ("pooled", POOLED_BACKEND, send_each),      # постоянное соединение на процесс
+    ("queued", POOLED_BACKEND, send_queued),    # очередь в Redis и отправка пачками
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=500, help="количество писем в каждом режиме")
+    parser.add_argument("--connect-delay", type=float, default=0.05, help="задержка установки соединения (секунды)")
+    args = parser.parse_args()
+
+    sink = start_sink(connect_delay=args.connect_delay)
+    settings.EMAIL_HOST, settings.EMAIL_PORT = sink.server_address
+    settings.EMAIL_USE_TLS = False
+    settings.EMAIL_HOST_USER = settings.EMAIL_HOST_PASSWORD = ""  # заглушка не поддерживает AUTH
+    mail.redis_client.delete(mail.QUEUE_KEY, mail.PROCESSING_KEY, mail.FLUSH_KEY, mail.FLUSH_LOCK_KEY)
+
+    print(f"{'режим':<8} {'писем':>7} {'писем/с':>10} {'соединений':>11}")
+    for name, backend, send in MODES:
+        settings.EMAIL_BACKEND = backend
+        close_shared_connection()
+        connections, messages = sink.connections, sink.messages
+
+        started = time.perf_counter()
+        send(args.messages)
+        close_shared_connection()
+        elapsed = time.perf_counter() - started
+
+        time.sleep(0.05)  # заглушка досчитывает последнее письмо в своём потоке
+        delivered = sink.messages - messages
+        if delivered != args.messages:
+            raise RuntimeError(f"{name}: заглушка получила {delivered} писем из {args.messages}")
+        print(f"{name:<8} {args.messages:>7} {args.messages / elapsed:>10.1f} {sink.connections - connections:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+'''
+Сравнение пропускной способности эндпоинта курса при попадании в кэш:
+рендеринг через DRF Response / JSONRenderer против готового тела из кэша.
+
+Запуск из корня проекта на dev-окружении (нужен Redis из настроек и заполненный реестр символов):
+    python benchmarks/price_view.py --symbol BTC --requests 20000
+
+Представления вызываются в одном потоке без HTTP-сервера, поэтому результат показывает
+накладные расходы Django/DRF и обращений к Redis на одно ядро (запросов в секунду процессорного времени)
+'''
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.test import RequestFactory
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.crypto.async_views import AsyncCryptoPriceView
+from apps.crypto.services import redis, symbols
+from apps.crypto.views import CryptoPriceAPIView
+
+# Лимит запросов отключается: иначе замер упирается в 429, а варианты сравниваются с разным числом обращений к Redis
+settings.RATELIMIT_ENABLE = False
+
+
+class RenderedPriceView(APIView):
+    """
+    Путь попадания в кэш до появления готового тела: Response и JSONRenderer на каждый запрос
+    """
+    permission_classes = CryptoPriceAPIView.permission_classes
+
+    def get(self, request, symbol):
+        symbol = symbol.upper()
+        symbols.get_symbol_map()
+        redis.record_requests([symbol])
+        cached = redis.get_cached_price(symbol)
+        return Response({"symbol": symbol, "price": cached.price, "source": "cache"})
+
+
+def run_sync(view, request, symbol, count):
+    for _ in range(count):
+        response = view(request, symbol=symbol)
+        if hasattr(response, "render"):
+            response.render()  # как это делает обработчик запросов Django
+    return response
+
+
+def run_async(view, request, symbol, count):
+    async def loop():
+        for _ in range(count):
+            response = await view(request, symbol=symbol)
+        return response
+    return asyncio.run(loop())
+
+
+def measure(name, runner, view, make_request, symbol, count, warmup):
+    redis.set_cached_price(symbol, 1.0)  # курс не должен устареть во время замера
+    request = make_request()
+    runner(view, request, symbol, warmup)
+
+    started, cpu_started = time.perf_counter(), time.process_time()
+    response = runner(view, request, symbol, count)
+    elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu_started
+
+    assert response.status_code in (200, 304), f"{name}: статус {response.status_code}"
+    print(f"{name:<22} {count / elapsed:>10.0f} {count / cpu:>12.0f} {elapsed / count * 1e6:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbol", default="BTC")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--warmup", type=int, default=500)
+    args = parser.parse_args()
+
+    symbol = args.symbol.upper()
+    if symbol not in symbols.get_symbol_map():
+        sys.exit(f"Символ {symbol} отсутствует в реестре, запустите fetch_supported_symbols")
+
+    logging.disable(logging.INFO)  # в замер не входит вывод логов
+
+    factory = RequestFactory()
+    path = f"/api/v1/crypto/price/{symbol}/"
+
+    def plain():
+        return factory.get(path)
+
+    def conditional():
+        return factory.get(path, HTTP_IF_NONE_MATCH=redis.get_cached_price(symbol).etag)
+
+    print(f"{'вариант':<22} {'запросов/с':>10} {'на ядро/с':>12} {'мкс/запрос':>10}")
+    variants = [
+        ("drf render", run_sync, RenderedPriceView.as_view(), plain),
+        ("pre-serialized", run_sync, CryptoPriceAPIView.as_view(), plain),
+        ("pre-serialized async", run_async, AsyncCryptoPriceView.as_view(), plain),
+        ("304 If-None-Match", run_sync, CryptoPriceAPIView.as_view(), conditional),
+    ]
+    for name, runner, view, make_request in variants:
+        measure(name, runner, view, make_request, symbol, args.requests, args.warmup)
+
+
+if __name__ == "__main__":
+    main()
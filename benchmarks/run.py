@@ -0,0 +1,320 @@
+'''
+Офлайн-бенчмарки эндпоинтов авторизации и курсов криптовалют.
+
+Запуск из корня проекта (нужен локальный Redis, база BENCH_REDIS_URL очищается перед запуском):
+    python benchmarks/run.py
+    python benchmarks/run.py --only price_hit,token --scale 0.2 --baseline benchmarks/results/<commit>.json
+
+Запросы выполняются через django.test.Client со всеми middleware, но без HTTP-сервера.
+CoinGecko заменяется локальной заглушкой, письма остаются в памяти, задачи Celery выполняются сразу.
+Результаты (запросов в секунду, p50/p99 в миллисекундах) сохраняются в JSON для сравнения между коммитами
+'''
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.core import mail
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from apps.accounts.models import User
+from apps.accounts.tokens import RefreshToken
+from apps.crypto.services import redis
+from apps.crypto.services.refresh import refresh_prices
+from apps.crypto.services.tasks import fetch_supported_symbols
+from benchmarks.coingecko_stub import start_stub
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+EMAIL = "loadtest.user@example.com"
+PASSWORDS = ("Tq7#vLm2pZ9!", "Rw4$kNs8xB3?")  # пароль меняется по кругу в сценарии change_password
+
+
+class Scenario:
+    """
+    Сценарий замера: setup и teardown выполняются один раз, prepare - перед каждым запросом вне замера
+    """
+    name = ""
+    requests = 1000          # количество запросов по умолчанию (умножается на --scale)
+    expected_status = 200
+
+    def __init__(self, client, context):
+        self.client = client
+        self.context = context
+
+    def setup(self):
+        pass
+
+    def prepare(self):
+        pass
+
+    def request(self):
+        raise NotImplementedError
+
+    def teardown(self):
+        pass
+
+    def auth(self):
+        return {"HTTP_AUTHORIZATION": f"Bearer {self.context['access']}"}
+
+
+class PriceHit(Scenario):
+    """
+    Свежий курс из кэша
+    """
+    name = "price_hit"
+    requests = 3000
+
+    def setup(self):
+        refresh_prices(["BTC"])
+
+    def request(self):
+        return self.client.get(reverse("crypto-price", args=["BTC"]), **self.auth())
+
+
+class PriceMiss(Scenario):
+    """
+    Курса нет в кэше, обновление уже запущено другим запросом: ответ 202 без похода в очередь
+    """
+    name = "price_miss"
+    requests = 3000
+    expected_status = 202
+
+    def setup(self):
+        redis.crypto_cache.delete("crypto:ETH")
+        redis.acquire_refresh_lease("ETH", ttl=3600)
+
+    def request(self):
+        return self.client.get(reverse("crypto-price", args=["ETH"]), **self.auth())
+
+    def teardown(self):
+        redis.release_refresh_leases(["ETH"])
+
+
+class PriceFallback(Scenario):
+    """
+    Промах кэша с получением курса напрямую из CoinGecko (режим разработки)
+    """
+    name = "price_fallback"
+    requests = 500
+
+    def setup(self):
+        settings.API_ALLOW_FALLBACK = True
+
+    def prepare(self):
+        redis.crypto_cache.delete("crypto:SOL")
+        redis.release_refresh_leases(["SOL"])
+
+    def request(self):
+        return self.client.get(reverse("crypto-price", args=["SOL"]), **self.auth())
+
+    def teardown(self):
+        settings.API_ALLOW_FALLBACK = False
+
+
+class Token(Scenario):
+    """
+    Получение пары токенов по email и паролю
+    """
+    name = "token"
+    requests = 40
+
+    def request(self):
+        data = {"email": EMAIL, "password": self.context["password"]}
+        return self.client.post(reverse("token_obtain_pair"), data, content_type="application/json")
+
+
+class TokenRefresh(Scenario):
+    """
+    Обновление токена с ротацией: каждый следующий запрос использует новый refresh-токен
+    """
+    name = "token_refresh"
+    requests = 500
+
+    def setup(self):
+        self.refresh = str(RefreshToken.for_user(self.context["user"]))
+
+    def request(self):
+        response = self.client.post(reverse("token_refresh"), {"refresh": self.refresh}, content_type="application/json")
+        if response.status_code == 200:
+            self.refresh = response.json()["refresh"]
+        return response
+
+
+class Register(Scenario):
+    """
+    Регистрация нового пользователя с отправкой письма подтверждения
+    """
+    name = "register"
+    requests = 40
+    expected_status = 201
+
+    def setup(self):
+        self.counter = 0
+
+    def request(self):
+        self.counter += 1
+        data = {"email": f"bench.{time.time_ns()}.{self.counter}@example.com", "password": PASSWORDS[0]}
+        return self.client.post(reverse("register"), data, content_type="application/json")
+
+
+class ChangePassword(Scenario):
+    """
+    Смена пароля аутентифицированным пользователем
+    """
+    name = "change_password"
+    requests = 20
+
+    def request(self):
+        old = self.context["password"]
+        new = PASSWORDS[1] if old == PASSWORDS[0] else PASSWORDS[0]
+        data = {"old_password": old, "new_password": new}
+        response = self.client.patch(reverse("change-password"), data, content_type="application/json", **self.auth())
+        if response.status_code == 200:
+            self.context["password"] = new
+        return response
+
+
+SCENARIOS = [PriceHit, PriceMiss, PriceFallback, Token, TokenRefresh, Register, ChangePassword]
+
+
+def bootstrap():
+    '''
+    Чистое окружение: пустая база Redis, новая SQLite, реестр символов из заглушки CoinGecko, тестовый пользователь
+    '''
+    try:
+        redis.redis_client.flushdb()
+    except RedisConnectionError:
+        sys.exit(f"Redis недоступен по адресу {settings.BENCH_REDIS_URL}, задайте BENCH_REDIS_URL")
+
+    Path(settings.DATABASES["default"]["NAME"]).unlink(missing_ok=True)
+    call_command("migrate", verbosity=0)
+
+    stub = start_stub()
+    settings.COINGECKO_API_URL = f"http://127.0.0.1:{stub.server_address[1]}"
+    fetch_supported_symbols(pages=1)
+
+    user = User.objects.create_user(EMAIL, PASSWORDS[0], is_verified=True)
+    return {"user": user, "password": PASSWORDS[0], "access": str(RefreshToken.for_user(user).access_token)}
+
+
+def percentile(sorted_values, q):
+    # Метод ближайшего ранга
+    return sorted_values[max(math.ceil(q * len(sorted_values)) - 1, 0)]
+
+
+def measure(scenario, count, warmup):
+    scenario.setup()
+    try:
+        for _ in range(warmup):
+            scenario.prepare()
+            scenario.request()
+
+        latencies = []
+        for _ in range(count):
+            scenario.prepare()
+            started = time.perf_counter()
+            response = scenario.request()
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != scenario.expected_status:
+                raise RuntimeError(f"{scenario.name}: статус {response.status_code}, ответ {response.content[:200]!r}")
+    finally:
+        scenario.teardown()
+        mail.outbox = []
+
+    latencies.sort()
+    return {
+        "requests": count,
+        "rps": round(count / sum(latencies), 1),
+        "mean_ms": round(sum(latencies) / count * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+    }
+
+
+def git_revision():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, text=True).strip())
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, dirty
+
+
+def print_comparison(results, baseline_path):
+    baseline = json.loads(Path(baseline_path).read_text())["results"]
+    print(f"\nСравнение с {baseline_path}")
+    print(f"{'сценарий':<16} {'rps':>10} {'p99':>10}")
+    for name, result in results.items():
+        if name in baseline:
+            rps = (result["rps"] / baseline[name]["rps"] - 1) * 100
+            p99 = (result["p99_ms"] / baseline[name]["p99_ms"] - 1) * 100
+            print(f"{name:<16} {rps:>+9.1f}% {p99:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help="сценарии через запятую: " + ",".join(s.name for s in SCENARIOS))
+    parser.add_argument("--scale", type=float, default=1.0, help="множитель количества запросов")
+    parser.add_argument("--output", help="файл результатов (по умолчанию benchmarks/results/<commit>.json)")
+    parser.add_argument("--baseline", help="файл результатов для сравнения")
+    args = parser.parse_args()
+
+    selected = set(args.only.split(",")) if args.only else {s.name for s in SCENARIOS}
+    unknown = selected - {s.name for s in SCENARIOS}
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(sorted(unknown))}")
+
+    context = bootstrap()
+    client = Client()
+
+    results = {}
+    print(f"{'сценарий':<16} {'запросов':>8} {'rps':>10} {'p50, мс':>10} {'p99, мс':>10}")
+    for scenario_class in SCENARIOS:
+        if scenario_class.name not in selected:
+            continue
+        count = max(int(scenario_class.requests * args.scale), 1)
+        result = results[scenario_class.name] = measure(scenario_class(client, context), count, max(count // 20, 1))
+        print(f"{scenario_class.name:<16} {count:>8} {result['rps']:>10.1f} {result['p50_ms']:>10.3f} {result['p99_ms']:>10.3f}")
+
+    commit, dirty = git_revision()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "platform": platform.platform(),
+        "scale": args.scale,
+        "results": results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{commit}{'-dirty' if dirty else ''}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"\nРезультаты сохранены в {output}")
+
+    if args.baseline:
+        print_comparison(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
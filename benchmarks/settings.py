@@ -0,0 +1,40 @@
+'''
+Настройки для офлайн-бенчмарков: локальный Redis в отдельной базе, SQLite во временном файле,
+письма в памяти (locmem), задачи Celery выполняются сразу в процессе, CoinGecko заменяется локальной заглушкой
+'''
+import os
+import tempfile
+
+from core.settings import *  # noqa: F401,F403
+
+DEBUG = False
+ALLOWED_HOSTS = ["testserver", "localhost"]
+SECRET_KEY = SECRET_KEY or "benchmark-secret-key"  # noqa: F405
+
+BENCH_REDIS_URL = os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/15")  # база очищается перед запуском
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(tempfile.gettempdir(), "crypto_api_bench.sqlite3"),
+    }
+}
+
+CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': BENCH_REDIS_URL}
+    for alias in ('default', 'cache-for-ratelimiting', 'crypto')
+}
+
+# Лимиты запросов отключены, иначе замеры эндпоинтов токенов упираются в 100 запросов в сутки
+RATELIMIT_ENABLE = False
+
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+CELERY_BROKER_URL = 'memory://'
+CELERY_RESULT_BACKEND = 'cache+memory://'
+CELERY_TASK_ALWAYS_EAGER = True
+
+COINGECKO_API_URL = "http://127.0.0.1:0"  # заменяется адресом заглушки при запуске
+COINGECKO_API_KEY = "benchmark"
+
+API_ALLOW_FALLBACK = False  # включается только для сценария price_fallback
@@ -0,0 +1,86 @@
+'''
+Скорость вставки и размер индекса первичного ключа для uuid4 и упорядоченных по времени UUIDv7.
+
+Таблица повторяет схему Django для UUIDField в SQLite (char(32) PRIMARY KEY с отдельным индексом),
+кэш страниц ограничен, чтобы индекс не помещался в память целиком, как у большой таблицы на сервере:
+    python benchmarks/uuid_keys.py --rows 1000000 --cache-mb 16
+
+Результат: строк в секунду за весь прогон и за последний отрезок (деградация по мере роста таблицы),
+размер индекса первичного ключа и заполненность его страниц
+'''
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from apps.common.utils import uuid7
+
+GENERATORS = [("uuid4", uuid.uuid4), ("uuid7", uuid7)]
+
+
+def run(name, generate, rows, batch_size, cache_mb, report_every):
+    path = os.path.join(tempfile.gettempdir(), f"crypto_api_uuid_{name}.sqlite3")
+    Path(path).unlink(missing_ok=True)
+    db = sqlite3.connect(path, isolation_level=None)
+    db.execute(f"PRAGMA cache_size = -{cache_mb * 1024}")
+    db.execute("PRAGMA journal_mode = WAL")
+    db.execute("PRAGMA synchronous = NORMAL")
+    db.execute('CREATE TABLE "bench_user" ("id" char(32) NOT NULL PRIMARY KEY, "created_at" datetime NOT NULL)')
+
+    started = segment_started = time.perf_counter()
+    segment_rows, segment_rps = 0, 0.0
+    for offset in range(0, rows, batch_size):
+        # Как bulk_create: пачка строк в одной транзакции, id в формате Django для SQLite (hex без дефисов)
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        batch = [(generate().hex, now) for _ in range(min(batch_size, rows - offset))]
+        db.execute("BEGIN")
+        db.executemany('INSERT INTO "bench_user" ("id", "created_at") VALUES (?, ?)', batch)
+        db.execute("COMMIT")
+
+        inserted = offset + len(batch)
+        if inserted % report_every == 0 or inserted == rows:
+            segment_rps = (inserted - segment_rows) / (time.perf_counter() - segment_started)
+            segment_rows, segment_started = inserted, time.perf_counter()
+    elapsed = time.perf_counter() - started
+
+    index_bytes, unused = db.execute(
+        "SELECT SUM(pgsize), SUM(unused) * 1.0 / SUM(pgsize) "
+        "FROM dbstat WHERE name = 'sqlite_autoindex_bench_user_1'"
+    ).fetchone()
+    db.close()
+    for suffix in ("", "-wal", "-shm"):
+        Path(path + suffix).unlink(missing_ok=True)
+
+    return {
+        "rps": rows / elapsed,
+        "last_rps": segment_rps,
+        "index_mb": index_bytes / 1024 / 1024,
+        "fill": 1 - unused,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="количество строк")
+    parser.add_argument("--batch-size", type=int, default=1000, help="строк в одной транзакции")
+    parser.add_argument("--cache-mb", type=int, default=16, help="размер кэша страниц SQLite (МБ)")
+    args = parser.parse_args()
+    report_every = max(args.rows // 10, args.batch_size) // args.batch_size * args.batch_size
+
+    print(f"{'ключ':<6} {'строк':>9} {'строк/с':>10} {'последние 10%':>14} {'индекс, МБ':>11} {'заполнение':>11}")
+    for name, generate in GENERATORS:
+        result = run(name, generate, args.rows, args.batch_size, args.cache_mb, report_every)
+        print(
+            f"{name:<6} {args.rows:>9} {result['rps']:>10.0f} {result['last_rps']:>14.0f} "
+            f"{result['index_mb']:>11.1f} {result['fill']:>10.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -25,11 +25,16 @@ app.conf.beat_schedule = {
         'task': 'apps.accounts.tasks.delete_unverified_users',
         'schedule': crontab(hour=0, minute=0),  # Выполнять каждый день в 00:00
     },
-}
-
-app.conf.beat_schedule = {
     'update-supported-symbols-daily': {
-        'task': 'apps.crypto.tasks.fetch_supported_symbols',
+        'task': 'apps.crypto.services.tasks.fetch_supported_symbols',
         'schedule': crontab(hour=0, minute=0),  # Выполнять каждый день в 00:00
     },
+    'prewarm-popular-symbols': {
+        'task': 'apps.crypto.services.tasks.prewarm_popular_symbols',
+        'schedule': 30.0,  # Выполнять каждые 30 секунд, курс в кэше живёт 60 секунд
+    },
+    'rollup-price-history': {
+        'task': 'apps.crypto.services.tasks.rollup_price_history',
+        'schedule': 60.0,  # Выполнять каждую минуту
+    },
 }
@@ -2,6 +2,8 @@ from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
+from apps.common.views import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
@@ -9,4 +11,6 @@ urlpatterns = [
 
     path("api/v1/auth/", include("apps.accounts.urls")),
     path("api/v1/crypto/", include("apps.crypto.urls")),
+
+    path("metrics", metrics_view, name="metrics"),
 ]